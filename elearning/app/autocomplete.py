@@ -0,0 +1,354 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+
+from .models import Course, User
+from .search import TOKEN_RE
+
+AUTOCOMPLETE_LIMIT = 10
+# Shared by every process; a write anywhere bumps it and logs what changed
+# under the new version, and the other processes re-read just those rows on
+# their next lookup. Its expiry bounds how long writes that skip the signals
+# (queryset updates) can go unseen.
+AUTOCOMPLETE_VERSION_KEY = "autocomplete:version"
+AUTOCOMPLETE_MAX_AGE = 60 * 15
+# A process further behind than this rebuilds instead of replaying the log
+AUTOCOMPLETE_CHANGE_LOG_SIZE = 200
+
+
+class _Node:
+    __slots__ = ("edge", "children", "entries", "top")
+
+    def __init__(self, edge=""):
+        self.edge = edge
+        self.children = {}  # first character of the child's edge -> child
+        self.entries = set()  # entry keys whose indexed string ends here
+        self.top = []  # best AUTOCOMPLETE_LIMIT entry keys in this subtree
+
+
+class PrefixIndex:
+    """
+    A compressed (radix) trie over normalized strings. Every node keeps the
+    best ``AUTOCOMPLETE_LIMIT`` entries of its subtree, so a lookup is one
+    walk down the prefix with no subtree traversal.
+    """
+
+    def __init__(self):
+        self.root = _Node()
+        self.entries = {}  # key -> {"label", "score", ...}
+        self.strings = {}  # key -> strings the entry is indexed under
+
+    def _rank(self, key):
+        entry = self.entries[key]
+        return (-entry["score"], entry["label"].lower(), key)
+
+    def _refresh(self, node):
+        candidates = set(node.entries)
+        for child in node.children.values():
+            candidates.update(child.top)
+        node.top = sorted(candidates, key=self._rank)[:AUTOCOMPLETE_LIMIT]
+
+    def _path(self, string, create):
+        """Nodes from the root to the node for ``string``; None if it is absent."""
+        node, path, rest = self.root, [self.root], string
+        while rest:
+            child = node.children.get(rest[0])
+            if child is None:
+                if not create:
+                    return None
+                child = node.children[rest[0]] = _Node(rest)
+                path.append(child)
+                return path
+            common = 0
+            limit = min(len(child.edge), len(rest))
+            while common < limit and child.edge[common] == rest[common]:
+                common += 1
+            if common < len(child.edge):
+                if not create:
+                    return None
+                # Split the edge at the shared prefix
+                middle = _Node(child.edge[:common])
+                child.edge = child.edge[common:]
+                middle.children[child.edge[0]] = child
+                middle.top = list(child.top)
+                node.children[rest[0]] = middle
+                child = middle
+            node, rest = child, rest[common:]
+            path.append(node)
+        return path
+
+    def _walk(self, string):
+        """The nodes whose edges spell out a prefix of ``string``."""
+        node, path, rest = self.root, [self.root], string
+        while rest:
+            child = node.children.get(rest[0])
+            if child is None or not rest.startswith(child.edge):
+                break
+            node, rest = child, rest[len(child.edge):]
+            path.append(node)
+        return path
+
+    def _prune(self, path):
+        # Drop emptied leaves and merge single-child nodes back into their parent edge
+        for parent, node in zip(reversed(path[:-1]), reversed(path[1:])):
+            if node.entries or len(node.children) > 1:
+                break
+            if node.children:
+                (child,) = node.children.values()
+                child.edge = node.edge + child.edge
+                parent.children[child.edge[0]] = child
+            else:
+                del parent.children[node.edge[0]]
+
+    def _insert(self, key, strings, entry):
+        self.entries[key] = entry
+        self.strings[key] = set(strings)
+        return [self._path(string, create=True) for string in self.strings[key]]
+
+    def add(self, key, strings, **entry):
+        """Index ``entry`` under each of ``strings``, replacing any previous version."""
+        self.remove(key)
+        for path in self._insert(key, strings, entry):
+            path[-1].entries.add(key)
+            for node in reversed(path):
+                self._refresh(node)
+
+    def load(self, items):
+        """Bulk-index ``(key, strings, entry)`` items, ranking each node once at the end."""
+        for key, strings, entry in items:
+            for path in self._insert(key, strings, entry):
+                path[-1].entries.add(key)
+        # Children before parents, without recursion
+        order, stack = [], [self.root]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(node.children.values())
+        for node in reversed(order):
+            self._refresh(node)
+
+    def remove(self, key):
+        if key not in self.entries:
+            return
+        strings = self.strings.pop(key)
+        # Purge the key everywhere first so no refresh can pull it back in
+        for string in strings:
+            path = self._path(string, create=False)
+            path[-1].entries.discard(key)
+            for node in path:
+                if key in node.top:
+                    node.top.remove(key)
+        del self.entries[key]
+        for string in strings:
+            self._prune(self._walk(string))
+            for node in reversed(self._walk(string)):
+                self._refresh(node)
+
+    def search(self, prefix, limit=AUTOCOMPLETE_LIMIT):
+        node, rest = self.root, prefix
+        while rest:
+            child = node.children.get(rest[0])
+            if child is None:
+                return []
+            if rest.startswith(child.edge):
+                rest = rest[len(child.edge):]
+            elif child.edge.startswith(rest):
+                rest = ""
+            else:
+                return []
+            node = child
+        return [dict(self.entries[key], key=key) for key in node.top[:limit]]
+
+
+def normalize(text):
+    return " ".join(token.lower() for token in TOKEN_RE.findall(text or ""))
+
+
+def word_suffixes(text):
+    """``"Intro to Django"`` is found by "intro", "to d" and "django"."""
+    words = normalize(text).split()
+    return {" ".join(words[i:]) for i in range(len(words))}
+
+
+_index = None
+_version = None  # shared version the local index reflects
+_lock = threading.Lock()
+# Owner of every indexed course, and each owner's published courses; an
+# instructor's score is how many they have published
+_course_owner = {}
+_instructor_courses = {}
+
+
+def _course_item(course_id, title, thumbnail, rating_count):
+    entry = {
+        "label": title, "score": rating_count,
+        "thumbnail": default_storage.url(thumbnail) if thumbnail else None,
+    }
+    return ("course", course_id), word_suffixes(title), entry
+
+
+def _instructor_item(user_id, full_name, username):
+    entry = {"label": full_name or username, "username": username, "score": len(_instructor_courses[user_id])}
+    return ("instructor", user_id), word_suffixes(full_name) | word_suffixes(username), entry
+
+
+def _add_course(course_id, title, thumbnail, rating_count, user_id):
+    key, strings, entry = _course_item(course_id, title, thumbnail, rating_count)
+    _index.add(key, strings, **entry)
+    _course_owner[course_id] = user_id
+    _instructor_courses.setdefault(user_id, set()).add(course_id)
+
+
+def _add_instructor(user_id, full_name, username):
+    key, strings, entry = _instructor_item(user_id, full_name, username)
+    _index.add(key, strings, **entry)
+
+
+def _forget_course(course_id):
+    _index.remove(("course", course_id))
+    user_id = _course_owner.pop(course_id, None)
+    if user_id is None:
+        return
+    courses = _instructor_courses[user_id]
+    courses.discard(course_id)
+    if courses:
+        entry = _index.entries[("instructor", user_id)]
+        _add_instructor(user_id, entry["label"], entry["username"])
+    else:
+        del _instructor_courses[user_id]
+        _index.remove(("instructor", user_id))
+
+
+def _build():
+    global _index
+    _index = PrefixIndex()
+    _course_owner.clear()
+    _instructor_courses.clear()
+    rows = Course.objects.filter(is_published=True).values_list(
+        "id", "title", "thumbnail_img", "rating_count",
+        "instructor_id", "instructor__full_name", "instructor__username",
+    )
+    items, instructors = [], {}
+    for course_id, title, thumbnail, rating_count, user_id, full_name, username in rows:
+        items.append(_course_item(course_id, title, thumbnail, rating_count))
+        _course_owner[course_id] = user_id
+        _instructor_courses.setdefault(user_id, set()).add(course_id)
+        instructors[user_id] = (full_name, username)
+    items += [_instructor_item(user_id, *names) for user_id, names in instructors.items()]
+    _index.load(items)
+
+
+def _apply(changes):
+    """Re-read the ``("course" | "instructor", id)`` rows in ``changes`` into the index."""
+    course_ids = {pk for kind, pk in changes if kind == "course"}
+    user_ids = {pk for kind, pk in changes if kind == "instructor"}
+    if course_ids:
+        rows = Course.objects.filter(pk__in=course_ids, is_published=True).values_list(
+            "id", "title", "thumbnail_img", "rating_count",
+            "instructor_id", "instructor__full_name", "instructor__username",
+        )
+        for course_id in course_ids:
+            _forget_course(course_id)
+        for course_id, title, thumbnail, rating_count, user_id, full_name, username in rows:
+            _add_course(course_id, title, thumbnail, rating_count, user_id)
+            _add_instructor(user_id, full_name, username)
+    user_ids &= _instructor_courses.keys()
+    if user_ids:
+        for user_id, full_name, username in User.objects.filter(pk__in=user_ids).values_list(
+            "id", "full_name", "username"
+        ):
+            _add_instructor(user_id, full_name, username)
+
+
+def _change_key(version):
+    return f"autocomplete:change:{version}"
+
+
+def _changes_since(version, latest):
+    """The changes logged after ``version`` up to ``latest``; None if any entry is missing."""
+    if version is None or not 0 < latest - version <= AUTOCOMPLETE_CHANGE_LOG_SIZE:
+        return None
+    keys = [_change_key(n) for n in range(version + 1, latest + 1)]
+    logged = cache.get_many(keys)
+    if len(logged) < len(keys):
+        return None
+    return [change for key in keys for change in logged[key]]
+
+
+def _shared_version():
+    return cache.get_or_set(AUTOCOMPLETE_VERSION_KEY, time.time_ns, AUTOCOMPLETE_MAX_AGE)
+
+
+def _publish(*changes):
+    """Log ``changes`` for the other processes after applying them locally."""
+    global _version
+    try:
+        version = cache.incr(AUTOCOMPLETE_VERSION_KEY)
+    except ValueError:
+        # A reseeded version leaves a gap, so every process rebuilds
+        cache.set(AUTOCOMPLETE_VERSION_KEY, time.time_ns(), AUTOCOMPLETE_MAX_AGE)
+        return
+    # A reader that sees the version before this entry lands treats it as a
+    # gap and rebuilds, which is slower but never wrong
+    cache.set(_change_key(version), changes, AUTOCOMPLETE_MAX_AGE)
+    # Only our own bump since the last sync: the local index is still current
+    if _index is not None and version == _version + 1:
+        _version = version
+
+
+def reset_index():
+    """Drop the index; the next lookup rebuilds it from the database."""
+    global _index
+    with _lock:
+        _index = None
+
+
+def suggest(query, limit=AUTOCOMPLETE_LIMIT):
+    """
+    Published courses and instructors with a word starting with ``query``,
+    best rated or most prolific first. The index is loaded from the database
+    on first use and answers from memory, re-reading only the rows other
+    processes have logged as changed since, or rebuilding if the log has a gap.
+    """
+    global _version
+    prefix = normalize(query)
+    if not prefix:
+        return []
+    version = _shared_version()
+    with _lock:
+        if _index is None or version != _version:
+            changes = _changes_since(_version, version) if _index is not None else None
+            if changes is None:
+                _build()
+            else:
+                _apply(changes)
+            _version = version
+        return _index.search(prefix, limit)
+
+
+def update_course(course):
+    """Re-index ``course`` after a save; unpublished courses drop out."""
+    with _lock:
+        if _index is not None:
+            _forget_course(course.pk)
+            if course.is_published:
+                _add_course(course.pk, course.title, course.thumbnail_img.name, course.rating_count, course.instructor_id)
+                _add_instructor(course.instructor_id, course.instructor.full_name, course.instructor.username)
+        _publish(("course", course.pk))
+
+
+def remove_course(course_id):
+    with _lock:
+        if _index is not None:
+            _forget_course(course_id)
+        _publish(("course", course_id))
+
+
+def update_instructor(user):
+    """Follow a rename of an instructor with published courses."""
+    with _lock:
+        if _index is not None and user.pk in _instructor_courses:
+            _add_instructor(user.pk, user.full_name, user.username)
+        _publish(("instructor", user.pk))
@@ -0,0 +1,95 @@
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.conf import settings
+from django.template.base import Node
+
+# Frames from these directories never explain where a query came from
+_LIBRARY_PATHS = tuple(
+    str(Path(path).resolve()) for path in sys.path if "packages" in path
+) + (str(Path(__file__).resolve()),)
+
+
+@dataclass(frozen=True)
+class QueryBudget:
+    max_queries: int
+    max_time_ms: float | None = None
+
+
+def query_budget(max_queries, max_time_ms=None):
+    """
+    Declare the most queries (and optionally total SQL milliseconds) a view
+    may spend on one request. Enforced by the route crawler in app.tests,
+    the time limit only with ``QUERY_BUDGET_CHECK_TIME``; apply it beneath
+    login_required and friends so they copy it over.
+    """
+    def decorator(view):
+        view.query_budget = QueryBudget(max_queries, max_time_ms)
+        return view
+    return decorator
+
+
+def _origin():
+    """Innermost project frame and template line responsible for the current query."""
+    code_frame = template_frame = None
+    frame = sys._getframe(2)
+    while frame and not (code_frame and template_frame):
+        filename = frame.f_code.co_filename
+        # type() rather than isinstance(): a lazy ``self`` must not be evaluated here
+        node = frame.f_locals.get("self")
+        if template_frame is None and issubclass(type(node), Node) and getattr(node, "origin", None):
+            template_frame = f"{node.origin.template_name}:{node.token.lineno}"
+        if code_frame is None and filename.startswith(str(settings.BASE_DIR)) \
+                and not filename.startswith(_LIBRARY_PATHS):
+            code_frame = f"{Path(filename).relative_to(settings.BASE_DIR)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return " <- ".join(filter(None, (template_frame, code_frame))) or "unknown"
+
+
+@dataclass
+class QueryRecorder:
+    """``connection.execute_wrapper`` that records each query with its origin."""
+    queries: list = field(default_factory=list)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, (time.perf_counter() - start) * 1000, _origin()))
+
+    @property
+    def total_time_ms(self):
+        return sum(duration for _, duration, _ in self.queries)
+
+    def duplicates(self):
+        """``(count, sql, origins)`` for every statement issued more than once."""
+        counts = Counter(sql for sql, _, _ in self.queries)
+        return [
+            (count, sql, sorted({origin for s, _, origin in self.queries if s == sql}))
+            for sql, count in counts.most_common()
+            if count > 1
+        ]
+
+    def check(self, budget):
+        """Return a report of every way these queries exceed ``budget``, or ''."""
+        problems = []
+        if len(self.queries) > budget.max_queries:
+            problems.append(f"{len(self.queries)} queries (budget {budget.max_queries})")
+        if settings.QUERY_BUDGET_CHECK_TIME and budget.max_time_ms is not None \
+                and self.total_time_ms > budget.max_time_ms:
+            problems.append(f"{self.total_time_ms:.1f} ms of SQL (budget {budget.max_time_ms} ms)")
+        if not problems:
+            return ""
+
+        lines = ["; ".join(problems)]
+        duplicates = self.duplicates()
+        if duplicates:
+            lines.append("Repeated queries:")
+            for count, sql, origins in duplicates:
+                lines.append(f"  {count}x {sql}")
+                lines.extend(f"      from {origin}" for origin in origins)
+        return "\n".join(lines)
@@ -0,0 +1,75 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+from django.db.models.functions import Substr
+
+CATALOG_PAGE_SIZE = 12
+SUMMARY_LENGTH = 200
+
+# Everything a course card renders, or keys its cached fragment on
+CARD_FIELDS = (
+    "id", "title", "price", "thumbnail_img", "category", "level",
+    "created_at", "updated_at", "rating_avg", "rating_count", "rating_sum",
+    "instructor__username", "instructor__full_name",
+)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def course_cards(queryset):
+    """Narrow a course queryset to card columns; ``summary`` replaces the description."""
+    return (
+        queryset.select_related("instructor")
+        .only(*CARD_FIELDS)
+        .annotate(summary=Substr("description", 1, SUMMARY_LENGTH))
+    )
+
+
+def encode_cursor(*values):
+    raw = "|".join(value.isoformat() if isinstance(value, datetime) else str(value) for value in values)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, *types):
+    """Decode a cursor made by ``encode_cursor``, converting each value with ``types``."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = base64.urlsafe_b64decode(padded).decode().split("|")
+        if len(values) != len(types):
+            raise InvalidCursor(cursor)
+        return [
+            datetime.fromisoformat(value) if kind is datetime else kind(value)
+            for kind, value in zip(types, values)
+        ]
+    except (ValueError, binascii.Error) as e:
+        raise InvalidCursor(cursor) from e
+
+
+def after(first, second, values):
+    """Rows strictly after ``values`` in ``-first, -second`` order."""
+    # The redundant outer bound lets the index seek instead of scanning from the top
+    return Q(**{f"{first}__lte": values[0]}) & (
+        Q(**{f"{first}__lt": values[0]}) | Q(**{f"{second}__lt": values[1]})
+    )
+
+
+def apply_cursor(queryset, cursor, first, second, *types):
+    """Continue ``queryset`` after ``cursor``; a missing or garbled cursor starts at the top."""
+    if not cursor:
+        return queryset
+    try:
+        return queryset.filter(after(first, second, decode_cursor(cursor, *types)))
+    except InvalidCursor:
+        return queryset
+
+
+def split_page(rows, page_size, key):
+    """Drop the look-ahead row, returning ``(page, next_cursor or None)``."""
+    if len(rows) <= page_size:
+        return rows, None
+    page = rows[:page_size]
+    return page, encode_cursor(*key(page[-1]))
@@ -0,0 +1,55 @@
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageDraw, ImageFont
+
+from .models import Certificate
+
+# A4 landscape at 150 dpi
+PAGE_SIZE = (1754, 1240)
+PAGE_DPI = 150
+BORDER_COLOR = (37, 99, 235)
+ACCENT_COLOR = (29, 78, 216)
+TEXT_COLOR = (31, 41, 55)
+MUTED_COLOR = (107, 114, 128)
+
+
+def _centered(draw, y, text, size, fill):
+    font = ImageFont.load_default(size=size)
+    width = draw.textlength(text, font=font)
+    draw.text(((PAGE_SIZE[0] - width) / 2, y), text, font=font, fill=fill)
+
+
+def render_certificate_image(certificate):
+    enrollment = certificate.enrollment
+    image = Image.new("RGB", PAGE_SIZE, "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((30, 30, PAGE_SIZE[0] - 30, PAGE_SIZE[1] - 30), outline=BORDER_COLOR, width=24)
+
+    _centered(draw, 220, "CERTIFICATE OF COMPLETION", 80, TEXT_COLOR)
+    _centered(draw, 380, "This certifies that", 40, MUTED_COLOR)
+    _centered(draw, 460, enrollment.user.full_name, 72, TEXT_COLOR)
+    _centered(draw, 600, "has successfully completed the course", 40, MUTED_COLOR)
+    _centered(draw, 680, f'"{enrollment.course.title}"', 60, ACCENT_COLOR)
+    _centered(draw, 900, f"Certificate ID: {certificate.certificate_id}", 30, MUTED_COLOR)
+    issued_at = certificate.issued_at
+    _centered(draw, 950, f"Issued on {issued_at:%B} {issued_at.day}, {issued_at:%Y}", 30, MUTED_COLOR)
+    return image
+
+
+def render_certificate_pdf(certificate_id):
+    """Job: render a certificate to PDF and store it in ``pdf_file``."""
+    certificate = Certificate.objects.select_related(
+        "enrollment__user", "enrollment__course"
+    ).get(pk=certificate_id)
+    if certificate.pdf_file:
+        return
+
+    buffer = BytesIO()
+    render_certificate_image(certificate).save(buffer, "PDF", resolution=PAGE_DPI)
+    certificate.pdf_file.save(
+        f"certificate-{certificate.certificate_id}.pdf",
+        ContentFile(buffer.getvalue()),
+        save=False,
+    )
+    Certificate.objects.filter(pk=certificate.pk).update(pdf_file=certificate.pdf_file.name)
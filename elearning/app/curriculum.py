@@ -0,0 +1,339 @@
+import time
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Section, Lecture
+
+CURRICULUM_TIMEOUT = 60 * 60 * 24
+
+
+def _version_key(course_id):
+    return f"curriculum:{course_id}:version"
+
+
+def curriculum_version(course_id):
+    # Seeded from the clock so an evicted version never resurrects an old snapshot
+    return cache.get_or_set(_version_key(course_id), time.time_ns, CURRICULUM_TIMEOUT)
+
+
+def bump_curriculum_version(course_id):
+    """Invalidate the cached curriculum of a course after a section/lecture write."""
+    try:
+        cache.incr(_version_key(course_id))
+    except ValueError:
+        cache.set(_version_key(course_id), time.time_ns(), CURRICULUM_TIMEOUT)
+
+
+async def abump_curriculum_version(course_id):
+    try:
+        await cache.aincr(_version_key(course_id))
+    except ValueError:
+        await cache.aset(_version_key(course_id), time.time_ns(), CURRICULUM_TIMEOUT)
+
+
+def build_curriculum(course_id):
+    """Serialize the section/lecture tree of a course with its counts."""
+    sections = {
+        row["id"]: {**row, "lectures": []}
+        for row in Section.objects.filter(course_id=course_id).values("id", "title", "order")
+    }
+    lectures = Lecture.objects.filter(section__course_id=course_id).values(
+        "id", "section_id", "title", "order", "is_previewable", "video", "resource_file"
+    )
+    preview_count = 0
+    for lecture in lectures:
+        video = lecture.pop("video")
+        lecture["video_url"] = default_storage.url(video) if video else ""
+        lecture["has_resource_file"] = bool(lecture.pop("resource_file"))
+        if lecture["is_previewable"]:
+            preview_count += 1
+        sections[lecture.pop("section_id")]["lectures"].append(lecture)
+
+    for section in sections.values():
+        section["lecture_count"] = len(section["lectures"])
+
+    return {
+        "sections": list(sections.values()),
+        "section_count": len(sections),
+        "lecture_count": sum(section["lecture_count"] for section in sections.values()),
+        "preview_count": preview_count,
+    }
+
+
+def get_curriculum(course_id):
+    """Return the curriculum snapshot of a course, building it on a cache miss."""
+    key = f"curriculum:{course_id}:{curriculum_version(course_id)}"
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_curriculum(course_id)
+        cache.set(key, snapshot, CURRICULUM_TIMEOUT)
+    return snapshot
+
+
+# Gap between neighbouring order keys: a move takes a key between its new
+# neighbours and only renumbers their siblings once that gap is used up
+ORDER_GAP = 1024
+
+SECTION_FIELDS = ("title",)
+LECTURE_FIELDS = ("title", "description", "is_previewable")
+
+
+class CurriculumError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class _Item:
+    """A section or lecture while a diff is applied; compared by identity."""
+
+    __slots__ = ("obj", "parent", "children", "new", "placed", "dirty")
+
+    def __init__(self, obj, parent=None, new=False):
+        self.obj = obj
+        self.parent = parent
+        self.children = []
+        self.new = new
+        self.placed = new
+        self.dirty = False
+
+
+def _assign_orders(items):
+    """
+    Give one parent's items strictly increasing ``order`` keys. Unplaced
+    items keep their key and placed ones are spread evenly between their
+    neighbours; the whole list is renumbered only when a gap is too narrow
+    or legacy keys are out of order.
+    """
+    def renumber():
+        for n, item in enumerate(items, 1):
+            _set_order(item, n * ORDER_GAP)
+
+    kept = [item.obj.order for item in items if not item.placed]
+    if any(a >= b for a, b in zip(kept, kept[1:])):
+        return renumber()
+
+    run, low = [], 0
+    for item in [*items, None]:
+        if item is not None and item.placed:
+            run.append(item)
+            continue
+        high = item.obj.order if item is not None else low + ORDER_GAP * (len(run) + 1)
+        if run:
+            step = (high - low) // (len(run) + 1)
+            if step < 1:
+                return renumber()
+            for n, placed in enumerate(run, 1):
+                _set_order(placed, low + n * step)
+            run = []
+        if item is not None:
+            low = item.obj.order
+
+
+def _set_order(item, order):
+    if item.new or item.obj.order != order:
+        item.obj.order = order
+        item.dirty = True
+
+
+FIELD_TYPES = {"title": str, "description": str, "is_previewable": bool}
+
+
+def _fields(op, allowed):
+    if not isinstance(op, dict):
+        raise CurriculumError("Operations must be JSON objects.")
+    unknown = set(op) - {"id", "ref", "section", "after", *allowed}
+    if unknown:
+        raise CurriculumError(f"Unknown fields: {', '.join(sorted(unknown))}.")
+    values = {field: op[field] for field in allowed if field in op}
+    for field, value in values.items():
+        if not isinstance(value, FIELD_TYPES[field]):
+            raise CurriculumError(f"{field} must be a {FIELD_TYPES[field].__name__}.")
+    if "title" in values and not values["title"].strip():
+        raise CurriculumError("Titles cannot be blank.")
+    return values
+
+
+class _Diff:
+    """The course's curriculum as ordered item lists, edited in memory."""
+
+    def __init__(self, course):
+        self.course = course
+        self.sections = {}  # id or ref -> _Item
+        self.lectures = {}
+        self.refs = {}
+        self.root = []
+        self.deleted_sections = set()
+        self.deleted_lectures = set()
+
+        for section in Section.objects.filter(course=course).only("id", "title", "order").order_by("order", "id"):
+            self.sections[section.pk] = _Item(section)
+            self.root.append(self.sections[section.pk])
+        lectures = Lecture.objects.filter(section__course=course).only(
+            "id", "section_id", "title", "description", "is_previewable", "order"
+        ).order_by("order", "id")
+        for lecture in lectures:
+            parent = self.sections[lecture.section_id]
+            self.lectures[lecture.pk] = _Item(lecture, parent)
+            parent.children.append(self.lectures[lecture.pk])
+
+    def find(self, value, items, kind):
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise CurriculumError(f"A {kind} must be given by id or ref, not {value!r}.")
+        item = self.refs.get(value) if isinstance(value, str) else items.get(value)
+        if item is None or item.obj.__class__ is not {"section": Section, "lecture": Lecture}[kind]:
+            raise CurriculumError(f"Unknown {kind} {value!r}.", status=404)
+        return item
+
+    def delete(self, pks, items, kind):
+        for pk in pks:
+            item = self.find(pk, items, kind)
+            siblings = item.parent.children if item.parent else self.root
+            siblings.remove(item)
+            del items[pk]
+            (self.deleted_lectures if kind == "lecture" else self.deleted_sections).add(item.obj.pk)
+
+    def place(self, item, siblings, op, kind):
+        """Put ``item`` into ``siblings`` per ``op["after"]``; absent appends."""
+        if "after" not in op:
+            siblings.append(item)
+        elif op["after"] is None:
+            siblings.insert(0, item)
+        else:
+            anchor = self.find(op["after"], self.lectures if kind == "lecture" else self.sections, kind)
+            if anchor not in siblings:
+                raise CurriculumError(f"Cannot place after {op['after']!r}: not in the same list.")
+            siblings.insert(siblings.index(anchor) + 1, item)
+
+    def create(self, op, obj, parent=None):
+        ref = op.get("ref")
+        if not isinstance(ref, str) or ref in self.refs:
+            raise CurriculumError("Every create needs a unique string ref.")
+        self.refs[ref] = _Item(obj, parent, new=True)
+        return self.refs[ref]
+
+    def apply(self, section_ops, lecture_ops):
+        self.delete(lecture_ops.get("delete", ()), self.lectures, "lecture")
+        self.delete(section_ops.get("delete", ()), self.sections, "section")
+
+        for op in section_ops.get("create", ()):
+            values = _fields(op, SECTION_FIELDS)
+            if "title" not in values:
+                raise CurriculumError("New sections need a title.")
+            self.place(self.create(op, Section(course=self.course, **values)), self.root, op, "section")
+        for op in section_ops.get("update", ()):
+            item = self.find(op.get("id"), self.sections, "section")
+            self._update(item, op, SECTION_FIELDS)
+            if "after" in op:
+                self.root.remove(item)
+                self.place(item, self.root, op, "section")
+                item.placed = True
+
+        for op in lecture_ops.get("create", ()):
+            values = _fields(op, LECTURE_FIELDS)
+            if "title" not in values:
+                raise CurriculumError("New lectures need a title.")
+            parent = self._live_section(op.get("section"))
+            self.place(self.create(op, Lecture(**values), parent), parent.children, op, "lecture")
+        for op in lecture_ops.get("update", ()):
+            item = self.find(op.get("id"), self.lectures, "lecture")
+            if item.parent.obj.pk in self.deleted_sections:
+                raise CurriculumError(f"Lecture {op.get('id')!r} is in a deleted section.")
+            self._update(item, op, LECTURE_FIELDS)
+            if "section" in op or "after" in op:
+                item.parent.children.remove(item)
+                if "section" in op:
+                    item.parent = self._live_section(op["section"])
+                self.place(item, item.parent.children, op, "lecture")
+                item.placed = True
+
+        _assign_orders(self.root)
+        for section in self.root:
+            _assign_orders(section.children)
+
+    def _live_section(self, value):
+        item = self.find(value, self.sections, "section")
+        if item not in self.root:
+            raise CurriculumError(f"Section {value!r} is deleted.")
+        return item
+
+    def _update(self, item, op, fields):
+        for field, value in _fields(op, fields).items():
+            if getattr(item.obj, field) != value:
+                setattr(item.obj, field, value)
+                item.dirty = True
+
+    def save(self):
+        now = timezone.now()
+        if self.deleted_lectures:
+            Lecture.objects.filter(pk__in=self.deleted_lectures).delete()
+        if self.deleted_sections:
+            Section.objects.filter(pk__in=self.deleted_sections).delete()
+
+        sections = [*self.root]
+        lectures = [lecture for section in sections for lecture in section.children]
+        for item in [*sections, *lectures]:
+            item.obj.updated_at = now  # bulk writes skip auto_now
+            if item.new:
+                item.obj.created_at = now
+        Section.objects.bulk_create([item.obj for item in sections if item.new])
+        for item in lectures:
+            if item.obj.section_id != item.parent.obj.pk:
+                item.obj.section = item.parent.obj
+                item.dirty = True
+        Lecture.objects.bulk_create([item.obj for item in lectures if item.new])
+
+        moved = [item.obj for item in sections if item.dirty and not item.new]
+        if moved:
+            Section.objects.bulk_update(moved, [*SECTION_FIELDS, "order", "updated_at"])
+        moved = [item.obj for item in lectures if item.dirty and not item.new]
+        if moved:
+            Lecture.objects.bulk_update(moved, [*LECTURE_FIELDS, "section", "order", "updated_at"])
+
+        return {
+            "sections": {ref: item.obj.pk for ref, item in self.refs.items() if isinstance(item.obj, Section)},
+            "lectures": {ref: item.obj.pk for ref, item in self.refs.items() if isinstance(item.obj, Lecture)},
+        }
+
+
+def _operations(diff, kind):
+    """Return the ``delete``/``create``/``update`` lists of ``diff[kind]``, checked for shape."""
+    ops = diff.get(kind) or {}
+    if not isinstance(ops, dict):
+        raise CurriculumError(f"{kind} must be a JSON object.")
+    unknown = set(ops) - {"delete", "create", "update"}
+    if unknown:
+        raise CurriculumError(f"Unknown {kind} operations: {', '.join(sorted(unknown))}.")
+    for name in ("delete", "create", "update"):
+        if not isinstance(ops.get(name, []), list):
+            raise CurriculumError(f"{kind}.{name} must be a list.")
+    for op in [*ops.get("create", ()), *ops.get("update", ())]:
+        if not isinstance(op, dict):
+            raise CurriculumError("Operations must be JSON objects.")
+    return ops
+
+
+def apply_curriculum_diff(course, diff):
+    """
+    Apply a batch of section and lecture edits to ``course`` in one transaction.
+
+    ``diff`` holds ``sections`` and ``lectures`` objects, each with optional
+    ``delete`` (ids), ``create`` and ``update`` lists, applied in that order.
+    Creates carry a client ``ref`` that later operations may use in place of
+    an id. ``after`` puts an item behind a sibling id or ref and ``null`` puts
+    it first; without it creates append and updates stay put. A lecture
+    update with ``section`` moves it to that section. Returns the ids of the
+    created items by ref.
+    """
+    if not isinstance(diff, dict):
+        raise CurriculumError("Expected a JSON object.")
+    section_ops, lecture_ops = _operations(diff, "sections"), _operations(diff, "lectures")
+    with transaction.atomic():
+        state = _Diff(course)
+        state.apply(section_ops, lecture_ops)
+        created = state.save()
+    bump_curriculum_version(course.pk)
+    return created
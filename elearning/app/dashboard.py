@@ -0,0 +1,52 @@
+from django.core.cache import cache
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Certificate, Enrollment, Review, User
+
+STUDENT_STATS_TIMEOUT = 60 * 15
+
+
+def _stats_key(user_id):
+    return f"student-stats:{user_id}"
+
+
+def _count(queryset, group_by):
+    # Correlated COUNT(*) usable as a column of the outer User row
+    return Coalesce(
+        Subquery(
+            queryset.order_by().values(group_by).annotate(total=Count("pk")).values("total")
+        ),
+        0,
+    )
+
+
+def student_stats(user):
+    """
+    Enrollment, certificate and review counts of ``user``, cached per user.
+    Soft-deleted courses no longer count; the subqueries join Course directly
+    and so bypass CourseManager.
+    """
+    key = _stats_key(user.pk)
+    stats = cache.get(key)
+    if stats is None:
+        stats = User.objects.filter(pk=user.pk).annotate(
+            total_enrolled=_count(
+                Enrollment.objects.filter(user=OuterRef("pk"), course__deleted_at__isnull=True), "user"
+            ),
+            certificates_count=_count(
+                Certificate.objects.filter(
+                    enrollment__user=OuterRef("pk"), enrollment__course__deleted_at__isnull=True
+                ),
+                "enrollment__user",
+            ),
+            reviews_count=_count(
+                Review.objects.filter(user=OuterRef("pk"), course__deleted_at__isnull=True), "user"
+            ),
+        ).values("total_enrolled", "certificates_count", "reviews_count").get()
+        cache.set(key, stats, STUDENT_STATS_TIMEOUT)
+    return stats
+
+
+def invalidate_student_stats(*user_ids):
+    cache.delete_many([_stats_key(user_id) for user_id in user_ids])
@@ -0,0 +1,22 @@
+from django.conf import settings
+
+# PRAGMAs that write to the database file and fail on a read-only connection
+WRITE_PRAGMAS = {"journal_mode"}
+
+
+def is_read_only(connection):
+    return "mode=ro" in str(connection.settings_dict["NAME"])
+
+
+def sqlite_pragmas(read_only=False):
+    """The ``SQLITE_PRAGMAS`` setting, adjusted for read-only connections."""
+    pragmas = dict(getattr(settings, "SQLITE_PRAGMAS", {}))
+    if read_only:
+        pragmas = {name: value for name, value in pragmas.items() if name not in WRITE_PRAGMAS}
+        pragmas["query_only"] = "ON"
+    return pragmas
+
+
+def apply_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
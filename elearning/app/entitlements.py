@@ -0,0 +1,59 @@
+import time
+
+from django.core.cache import cache
+
+from .models import Enrollment
+
+ENTITLEMENT_TIMEOUT = 60 * 60
+
+
+def _version_key(user_id):
+    return f"entitlements:{user_id}:version"
+
+
+def invalidate_entitlements(user_id):
+    """Drop the cached enrollment set of a user after an enrollment changes."""
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        cache.set(_version_key(user_id), time.time_ns(), ENTITLEMENT_TIMEOUT)
+
+
+def enrolled_course_ids(user):
+    """Return the frozenset of course ids ``user`` is enrolled in."""
+    if not user.is_authenticated:
+        return frozenset()
+    version = cache.get_or_set(_version_key(user.pk), time.time_ns, ENTITLEMENT_TIMEOUT)
+    key = f"entitlements:{user.pk}:{version}"
+    course_ids = cache.get(key)
+    if course_ids is None:
+        course_ids = frozenset(
+            Enrollment.objects.filter(user_id=user.pk).values_list("course_id", flat=True)
+        )
+        cache.set(key, course_ids, ENTITLEMENT_TIMEOUT)
+    return course_ids
+
+
+def is_enrolled(user, course_id):
+    return course_id in enrolled_course_ids(user)
+
+
+async def aenrolled_course_ids(user):
+    if not user.is_authenticated:
+        return frozenset()
+    version = await cache.aget_or_set(_version_key(user.pk), time.time_ns, ENTITLEMENT_TIMEOUT)
+    key = f"entitlements:{user.pk}:{version}"
+    course_ids = await cache.aget(key)
+    if course_ids is None:
+        course_ids = frozenset([
+            course_id
+            async for course_id in Enrollment.objects.filter(user_id=user.pk).values_list(
+                "course_id", flat=True
+            )
+        ])
+        await cache.aset(key, course_ids, ENTITLEMENT_TIMEOUT)
+    return course_ids
+
+
+async def ais_enrolled(user, course_id):
+    return course_id in await aenrolled_course_ids(user)
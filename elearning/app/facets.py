@@ -0,0 +1,120 @@
+import hashlib
+import time
+from functools import reduce
+from operator import and_
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import Course
+from .search import ranked_course_ids, tokenize
+
+FACET_TIMEOUT = 60 * 10
+FACET_VERSION_KEY = "facets:version"
+
+# (key, label, min price, max price); None leaves that side open
+PRICE_BUCKETS = (
+    ("free", "Free", 0, 0),
+    ("under_1000", "Under Rs 1000", "0.01", "999.99"),
+    ("1000_2000", "Rs 1000 - 1999", 1000, "1999.99"),
+    ("2000_plus", "Rs 2000 and up", 2000, None),
+)
+PUBLISHED_CHOICES = (("yes", "Yes", True), ("no", "No", False))
+
+
+def bump_facet_version():
+    """Invalidate every cached facet count after a course write."""
+    try:
+        cache.incr(FACET_VERSION_KEY)
+    except ValueError:
+        cache.set(FACET_VERSION_KEY, time.time_ns(), FACET_TIMEOUT)
+
+
+def _price_q(low, high):
+    q = Q()
+    if low not in (None, ""):
+        q &= Q(price__gte=low)
+    if high not in (None, ""):
+        q &= Q(price__lte=high)
+    return q
+
+
+def _filters(category, level, price_min, price_max, published):
+    """The sidebar filters as Q objects, keyed by the facet each one narrows."""
+    filters = {}
+    if category:
+        filters["category"] = Q(category=category)
+    if level:
+        filters["level"] = Q(level=level)
+    if price_min or price_max:
+        filters["price"] = _price_q(price_min, price_max)
+    if published in ("yes", "no"):
+        filters["published"] = Q(is_published=published == "yes")
+    return filters
+
+
+def _count(value_q, filters, facet):
+    # A facet's counts ignore its own filter so every alternative stays visible
+    others = [q for name, q in filters.items() if name != facet]
+    return Count("pk", filter=reduce(and_, others, value_q))
+
+
+def _aggregates(filters):
+    aggregates = {"total": _count(Q(), filters, None)}
+    for key, _ in Course.CATEGORIES:
+        aggregates[f"category_{key}"] = _count(Q(category=key), filters, "category")
+    for key, _ in Course.LEVELS:
+        aggregates[f"level_{key}"] = _count(Q(level=key), filters, "level")
+    for key, _, low, high in PRICE_BUCKETS:
+        aggregates[f"price_{key}"] = _count(_price_q(low, high), filters, "price")
+    for key, _, value in PUBLISHED_CHOICES:
+        aggregates[f"published_{key}"] = _count(Q(is_published=value), filters, "published")
+    return aggregates
+
+
+def _cache_key(version, query, instructor, **filters):
+    # Token order, repeats and case do not change the matches, so they share an entry
+    normalized = (
+        sorted(set(tokenize(query))) if query else None,
+        instructor.strip().lower(),
+        sorted((name, str(value).strip()) for name, value in filters.items() if value),
+    )
+    digest = hashlib.md5(repr(normalized).encode()).hexdigest()
+    return f"facets:{version}:{digest}"
+
+
+def _shape(counts):
+    return {
+        "total": counts["total"],
+        "category": [(key, label, counts[f"category_{key}"]) for key, label in Course.CATEGORIES],
+        "level": [(key, label, counts[f"level_{key}"]) for key, label in Course.LEVELS],
+        "price": [
+            (key, label, low, high, counts[f"price_{key}"]) for key, label, low, high in PRICE_BUCKETS
+        ],
+        "published": [(key, label, counts[f"published_{key}"]) for key, label, _ in PUBLISHED_CHOICES],
+    }
+
+
+async def afacet_counts(query="", category="", level="", instructor="",
+                        price_min=None, price_max=None, published=""):
+    """
+    Category, level, price-bucket and published counts for a search, computed
+    with one conditional aggregate over the matching courses and cached per
+    normalized query until the next course write.
+    """
+    version = await cache.aget_or_set(FACET_VERSION_KEY, time.time_ns, FACET_TIMEOUT)
+    key = _cache_key(
+        version, query, instructor,
+        category=category, level=level, price_min=price_min, price_max=price_max, published=published,
+    )
+    counts = await cache.aget(key)
+    if counts is None:
+        courses = Course.objects.all()
+        if query:
+            courses = courses.filter(pk__in=ranked_course_ids(query).values("course_id"))
+        if instructor:
+            courses = courses.filter(instructor__username__icontains=instructor)
+        filters = _filters(category, level, price_min, price_max, published)
+        counts = await courses.aaggregate(**_aggregates(filters))
+        await cache.aset(key, counts, FACET_TIMEOUT)
+    return _shape(counts)
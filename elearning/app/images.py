@@ -0,0 +1,64 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .jobs import enqueue
+from .models import Course
+
+# Widths generated for every thumbnail/avatar; the largest is written last and
+# doubles as the "derivatives are ready" marker.
+DERIVATIVE_WIDTHS = (160, 320, 640, 1024)
+DERIVATIVE_FORMATS = (
+    ("webp", "WEBP", "image/webp"),
+    ("jpg", "JPEG", "image/jpeg"),
+)
+DERIVATIVE_QUALITY = 80
+
+
+def derivative_name(name, width, ext):
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    return f"{directory}/derivatives/{stem}-{width}.{ext}"
+
+
+def derivatives_ready(name):
+    return default_storage.exists(derivative_name(name, DERIVATIVE_WIDTHS[-1], DERIVATIVE_FORMATS[-1][0]))
+
+
+def generate_derivatives(name):
+    """Write every resized WebP/JPEG variant of the stored image ``name``."""
+    if derivatives_ready(name):
+        return
+    with default_storage.open(name, "rb") as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+    for width in DERIVATIVE_WIDTHS:
+        # Never upscale: small originals get copies at their own width
+        resized = image
+        if image.width > width:
+            height = round(image.height * width / image.width)
+            resized = image.resize((width, height), Image.Resampling.LANCZOS)
+        for ext, pil_format, _ in DERIVATIVE_FORMATS:
+            output = resized.convert("RGB") if pil_format == "JPEG" else resized
+            buffer = BytesIO()
+            output.save(buffer, pil_format, quality=DERIVATIVE_QUALITY, optimize=True)
+            target = derivative_name(name, width, ext)
+            if default_storage.exists(target):
+                default_storage.delete(target)
+            default_storage.save(target, ContentFile(buffer.getvalue()))
+
+    # Course cards are cached by updated_at; move it so they re-render with the srcsets
+    Course.all_objects.filter(thumbnail_img=name).update(updated_at=timezone.now())
+
+
+def schedule_derivatives(name):
+    """Queue derivative generation for a `run_jobs` worker, which retries failures."""
+    if name:
+        enqueue("app.images.generate_derivatives", name=name)
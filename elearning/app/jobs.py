@@ -0,0 +1,69 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+RETRY_BACKOFF = timedelta(seconds=30)
+STALE_AFTER = timedelta(minutes=15)
+
+
+def enqueue(task, **payload):
+    """
+    Queue ``task`` (a dotted function path) to run in a `run_jobs` worker.
+
+    The row is written in the caller's transaction, so the job exists exactly
+    when the data it refers to has been committed.
+    """
+    return Job.objects.create(task=task, payload=payload)
+
+
+def claim(limit):
+    """Atomically move up to ``limit`` due jobs from queued to running."""
+    now = timezone.now()
+    candidates = (
+        Job.objects.filter(status="queued", run_after__lte=now)
+        .order_by("run_after", "pk")
+        .values_list("pk", flat=True)[:limit]
+    )
+    claimed = []
+    for job_id in candidates:
+        # Conditional update: only one worker can flip a given row
+        if Job.objects.filter(pk=job_id, status="queued").update(
+            status="running", attempts=F("attempts") + 1, updated_at=now
+        ):
+            claimed.append(job_id)
+    return claimed
+
+
+def requeue_stale():
+    """Return jobs whose worker died mid-run to the queue."""
+    return Job.objects.filter(
+        status="running", updated_at__lt=timezone.now() - STALE_AFTER
+    ).update(status="queued", updated_at=timezone.now())
+
+
+def run_job(job_id):
+    """Execute one claimed job and record its outcome."""
+    job = Job.objects.get(pk=job_id)
+    try:
+        import_string(job.task)(**job.payload)
+    except Exception:
+        logger.exception("Job %s (%s) failed", job.pk, job.task)
+        retry = job.attempts < MAX_ATTEMPTS
+        Job.objects.filter(pk=job.pk).update(
+            status="queued" if retry else "failed",
+            run_after=timezone.now() + RETRY_BACKOFF * job.attempts,
+            error=traceback.format_exc(),
+            updated_at=timezone.now(),
+        )
+        return False
+    Job.objects.filter(pk=job.pk).update(status="done", error="", updated_at=timezone.now())
+    return True
@@ -0,0 +1,165 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404, render
+from django.test import AsyncClient, Client, override_settings
+from django.urls import path, reverse
+
+from app.catalog import CATALOG_PAGE_SIZE, InvalidCursor, after, apply_cursor, course_cards, decode_cursor, split_page
+from app.facets import afacet_counts
+from app.models import Course
+from app.search import ranked_course_ids
+from app.views.review import REVIEW_MAX_PAGE_SIZE, REVIEW_PAGE_SIZE
+from elearning.urls import urlpatterns as project_urlpatterns
+
+# Synchronous twins of the async views, doing the same queries with the sync
+# ORM, so both can be measured on the same handler
+
+
+def sync_review_list(request, course_id):
+    course = get_object_or_404(Course, id=course_id)
+    reviews = course.reviews.order_by("-created_at", "-id").values(
+        "id", "user__full_name", "rating", "comment", "created_at"
+    )
+    try:
+        page_size = int(request.GET.get("page_size", REVIEW_PAGE_SIZE))
+    except ValueError:
+        page_size = REVIEW_PAGE_SIZE
+    page_size = max(1, min(page_size, REVIEW_MAX_PAGE_SIZE))
+
+    cursor = request.GET.get("cursor")
+    if cursor:
+        try:
+            reviews = reviews.filter(after("created_at", "id", decode_cursor(cursor, datetime, int)))
+        except InvalidCursor:
+            return JsonResponse({"error": "Invalid cursor."}, status=400)
+
+    page, next_cursor = split_page(
+        list(reviews[:page_size + 1]), page_size, lambda review: (review["created_at"], review["id"])
+    )
+    return JsonResponse({
+        "reviews": page,
+        "next_cursor": next_cursor,
+        "avg_rating": round(course.rating_avg, 1),
+        "total_reviews": course.rating_count,
+    })
+
+
+def sync_search_course(request):
+    # Free-text search only: the path the benchmark drives
+    query = request.GET.get("q", "").strip()
+    results = apply_cursor(ranked_course_ids(query), request.GET.get("cursor"), "score", "course_id", int, int)
+    rows, next_cursor = split_page(
+        list(results[:CATALOG_PAGE_SIZE + 1]), CATALOG_PAGE_SIZE, lambda row: (row["score"], row["course_id"])
+    )
+    course_ids = [row["course_id"] for row in rows]
+    found = course_cards(Course.objects.all()).in_bulk(course_ids)
+
+    params = request.GET.copy()
+    params.pop("cursor", None)
+    # Facets are a cache hit after the first request, so this hop is not the measured work
+    facets = async_to_sync(afacet_counts)(query)
+    price_buckets = []
+    for _, label, low, high, count in facets["price"]:
+        bucket = params.copy()
+        bucket["price_min"], bucket["price_max"] = low, "" if high is None else high
+        price_buckets.append((label, count, bucket.urlencode()))
+
+    return render(request, "course/search_course.html", {
+        "courses": [found[pk] for pk in course_ids if pk in found],
+        "facets": facets,
+        "price_buckets": price_buckets,
+        "next_cursor": next_cursor,
+        "is_first_page": "cursor" not in request.GET,
+        "querystring": params.urlencode(),
+        "query": query,
+    })
+
+
+urlpatterns = [
+    path("benchmark/sync/reviews/<int:course_id>/", sync_review_list, name="sync_review_list"),
+    path("benchmark/sync/search/", sync_search_course, name="sync_search_course"),
+    *project_urlpatterns,
+]
+
+
+def _summary(label, latencies, elapsed):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return (
+        f"{label:<11} {len(latencies) / elapsed:8.1f} req/s   "
+        f"p50 {statistics.median(latencies) * 1000:7.2f} ms   p95 {p95 * 1000:7.2f} ms"
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the async JSON/search views with synchronous twins under "
+        "concurrent load, each pair on the same handler: WSGI (thread per "
+        "request) and ASGI (one event loop)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--course", type=int, help="Course id for review_list (defaults to the first course).")
+        parser.add_argument("--query", default="course", help="Search term for search_course.")
+
+    def handle(self, *args, **options):
+        course_id = options["course"] or Course.objects.values_list("pk", flat=True).first()
+        if course_id is None:
+            raise CommandError("No courses found; seed some data first.")
+
+        # The in-process test clients always send Host: testserver
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"], ROOT_URLCONF=__name__,
+        ):
+            search = f"?q={options['query']}"
+            endpoints = {
+                "review_list": (
+                    reverse("review_list", args=[course_id]),
+                    reverse("sync_review_list", args=[course_id]),
+                ),
+                "search_course": (reverse("search_course") + search, reverse("sync_search_course") + search),
+            }
+            for name, (async_url, sync_url) in endpoints.items():
+                self.stdout.write(self.style.MIGRATE_HEADING(f"{name}  ({async_url})"))
+                for handler, run in (("wsgi", self._run_wsgi), ("asgi", self._run_asgi)):
+                    self.stdout.write(_summary(f"{handler} async", *run(async_url, options)))
+                    self.stdout.write(_summary(f"{handler} sync", *run(sync_url, options)))
+
+    def _run_wsgi(self, url, options):
+        def fetch(_):
+            client = Client()
+            start = time.perf_counter()
+            client.get(url)
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            latencies = list(pool.map(fetch, range(options["requests"])))
+        return latencies, time.perf_counter() - start
+
+    def _run_asgi(self, url, options):
+        async def run():
+            client = AsyncClient()
+            limit = asyncio.Semaphore(options["concurrency"])
+
+            async def fetch():
+                async with limit:
+                    start = time.perf_counter()
+                    await client.get(url)
+                    return time.perf_counter() - start
+
+            start = time.perf_counter()
+            latencies = await asyncio.gather(*(fetch() for _ in range(options["requests"])))
+            return latencies, time.perf_counter() - start
+
+        return asyncio.run(run())
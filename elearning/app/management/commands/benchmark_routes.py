@@ -0,0 +1,170 @@
+import json
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from app import urls as app_urls
+from app.budgets import QueryRecorder
+from app.models import ChunkedUpload, Course, Lecture, Review, Section, User
+
+ROLES = ("anonymous", "student", "instructor")
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Request every named route in app/urls.py with the test client and report "
+        "p50/p95/p99 latency, query count and peak memory, optionally against a "
+        "stored baseline. Run `seed_lms` first for realistic volumes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--roles", default="student,instructor", help=f"Comma-separated subset of {', '.join(ROLES)}.")
+        parser.add_argument("--route", action="append", help="Only benchmark these route names.")
+        parser.add_argument("--warm-cache", action="store_true", help="Keep the cache between iterations.")
+        parser.add_argument("--baseline", type=Path, help="Baseline JSON to compare against.")
+        parser.add_argument("--save-baseline", type=Path, help="Write these results as a baseline JSON.")
+        parser.add_argument(
+            "--tolerance", type=float, default=0.2,
+            help="Allowed p95 slowdown against the baseline before a route counts as regressed.",
+        )
+        parser.add_argument("--fail-on-regression", action="store_true")
+
+    def handle(self, *args, **options):
+        roles = options["roles"].split(",")
+        if unknown := set(roles) - set(ROLES):
+            raise CommandError(f"Unknown roles: {', '.join(sorted(unknown))}")
+        fixtures = self._fixtures()
+
+        results = {}
+        # The test client always sends Host: testserver
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            for pattern in app_urls.urlpatterns:
+                if options["route"] and pattern.name not in options["route"]:
+                    continue
+                try:
+                    kwargs = {name: fixtures[name] for name in pattern.pattern.converters}
+                except KeyError as e:
+                    self.stderr.write(f"Skipping {pattern.name}: no fixture for {e}")
+                    continue
+                url = reverse(pattern.name, kwargs=kwargs)
+                for role in roles:
+                    results[f"{pattern.name}@{role}"] = self._measure(url, fixtures[role], options)
+
+        baseline = json.loads(options["baseline"].read_text()) if options["baseline"] else {}
+        regressions = self._report(results, baseline, options["tolerance"])
+
+        if options["save_baseline"]:
+            options["save_baseline"].write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+            self.stdout.write(f"Baseline written to {options['save_baseline']}")
+        if regressions and options["fail_on_regression"]:
+            raise CommandError(f"{len(regressions)} routes regressed: {', '.join(regressions)}")
+
+    def _fixtures(self):
+        """Pick real objects to fill the URL parameters and the users to browse as."""
+        course = (
+            Course.objects.filter(is_published=True, sections__lectures__isnull=False)
+            .order_by("-rating_count", "pk").first()
+        )
+        if course is None:
+            raise CommandError("No published course with lectures; run `seed_lms` first.")
+        section = Section.objects.filter(course=course, lectures__isnull=False).first()
+        student = User.objects.filter(enrollments__course=course, role="student").first()
+        fixtures = {
+            "course_id": course.pk,
+            "section_id": section.pk,
+            "lecture_id": Lecture.objects.filter(section=section).values_list("pk", flat=True).first(),
+            "anonymous": None,
+            "student": student,
+            "instructor": course.instructor,
+        }
+        review = Review.objects.filter(course=course).values_list("pk", flat=True).first()
+        if review:
+            fixtures["review_id"] = review
+        upload = ChunkedUpload.objects.values_list("pk", flat=True).first()
+        if upload:
+            fixtures["upload_id"] = upload
+        return fixtures
+
+    def _fetch(self, client, url, options):
+        """One GET whose writes are rolled back, returning (seconds, queries)."""
+        if not options["warm_cache"]:
+            cache.clear()
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        try:
+            with transaction.atomic(), connection.execute_wrapper(recorder):
+                client.get(url)
+                raise _Rollback
+        except _Rollback:
+            pass
+        return time.perf_counter() - start, len(recorder.queries)
+
+    def _measure(self, url, user, options):
+        client = Client(raise_request_exception=False)
+        if user:
+            client.force_login(user)
+        self._fetch(client, url, options)  # warm up imports and template loading
+
+        latencies, queries = [], []
+        for _ in range(options["iterations"]):
+            elapsed, count = self._fetch(client, url, options)
+            latencies.append(elapsed * 1000)
+            queries.append(count)
+
+        # Peak memory in a separate pass; tracemalloc skews timings
+        tracemalloc.start()
+        self._fetch(client, url, options)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        return {
+            "p50_ms": round(statistics.median(latencies), 3),
+            "p95_ms": round(_percentile(latencies, 95), 3),
+            "p99_ms": round(_percentile(latencies, 99), 3),
+            "queries": max(queries),
+            "peak_kb": round(peak / 1024, 1),
+        }
+
+    def _report(self, results, baseline, tolerance):
+        self.stdout.write(
+            f"{'route':<34} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>7} {'peak KB':>9}  vs baseline"
+        )
+        regressions = []
+        for key, row in results.items():
+            line = (
+                f"{key:<34} {row['p50_ms']:8.2f} {row['p95_ms']:8.2f} {row['p99_ms']:8.2f} "
+                f"{row['queries']:7d} {row['peak_kb']:9.1f}"
+            )
+            before = baseline.get(key)
+            if before:
+                change = row["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0
+                notes = [f"p95 {change:+.0%}"]
+                if row["queries"] != before["queries"]:
+                    notes.append(f"queries {before['queries']} -> {row['queries']}")
+                regressed = change > tolerance or row["queries"] > before["queries"]
+                if regressed:
+                    regressions.append(key)
+                line += "  " + ", ".join(notes)
+                line = self.style.ERROR(line) if regressed else line
+            elif baseline:
+                line += "  (new)"
+            self.stdout.write(line)
+        return regressions
@@ -0,0 +1,136 @@
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from app.db import apply_pragmas, sqlite_pragmas
+
+# What an untuned Django SQLite connection runs with
+DEFAULT_PRAGMAS = {"journal_mode": "DELETE", "synchronous": "FULL"}
+
+CATALOG_READ = """
+    SELECT c.id, c.title, c.price, c.rating_avg, u.full_name
+    FROM app_course c JOIN app_user u ON u.id = c.instructor_id
+    WHERE c.is_published ORDER BY c.created_at DESC LIMIT 12
+"""
+REVIEW_READ = """
+    SELECT id, rating, comment, created_at FROM app_review
+    WHERE course_id = ? ORDER BY created_at DESC, id DESC LIMIT 20
+"""
+# Same shape as apply_rating_change: a short write transaction on a course row
+RATING_WRITE = "UPDATE app_course SET rating_count = rating_count + 0 WHERE id = ?"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure mixed read/write throughput of a copy of the database with "
+        "default SQLite settings and with SQLITE_PRAGMAS, using separate "
+        "reader and writer connections. Run `seed_lms` first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--writers", type=int, default=2)
+        parser.add_argument("--seconds", type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("This benchmark only applies to SQLite.")
+        connection.ensure_connection()
+        course_ids = list(
+            connection.connection.execute("SELECT id FROM app_course").fetchall()
+        )
+        if not course_ids:
+            raise CommandError("No courses found; run `seed_lms` first.")
+        self.course_ids = [row[0] for row in course_ids]
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "benchmark.sqlite3"
+            # Work on a copy: the benchmark writes and switches journal modes
+            with sqlite3.connect(path) as copy:
+                connection.connection.backup(copy)
+
+            runs = {
+                "default": self._run(path, DEFAULT_PRAGMAS, DEFAULT_PRAGMAS, options),
+                "tuned": self._run(path, sqlite_pragmas(), sqlite_pragmas(read_only=True), options),
+            }
+
+        self.stdout.write(f"{'mode':<8} {'reads/s':>10} {'writes/s':>10} {'locked':>8} {'read p95 ms':>12}")
+        for mode, result in runs.items():
+            self.stdout.write(
+                f"{mode:<8} {result['reads'] / options['seconds']:10.0f} "
+                f"{result['writes'] / options['seconds']:10.0f} {result['locked']:8d} "
+                f"{result['read_p95_ms']:12.2f}"
+            )
+        baseline = runs["default"]["reads"] + runs["default"]["writes"]
+        tuned = runs["tuned"]["reads"] + runs["tuned"]["writes"]
+        if baseline:
+            self.stdout.write(self.style.SUCCESS(f"Total throughput x{tuned / baseline:.2f} with tuning."))
+
+    def _connect(self, path, pragmas, read_only=False):
+        uri = f"file:{path}?mode=ro" if read_only else f"file:{path}"
+        conn = sqlite3.connect(uri, uri=True, isolation_level=None, check_same_thread=False)
+        apply_pragmas(conn.cursor(), pragmas)
+        return conn
+
+    def _run(self, path, pragmas, read_pragmas, options):
+        # Switch the journal mode once, before any worker connects
+        self._connect(path, pragmas).close()
+        stop = threading.Event()
+        lock = threading.Lock()
+        totals = {"reads": 0, "writes": 0, "locked": 0, "latencies": []}
+
+        def reader():
+            conn = self._connect(path, read_pragmas, read_only=True)
+            rng, reads, locked, latencies = random.Random(), 0, 0, []
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    conn.execute(CATALOG_READ).fetchall()
+                    conn.execute(REVIEW_READ, (rng.choice(self.course_ids),)).fetchall()
+                except sqlite3.OperationalError:
+                    locked += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+                reads += 1
+            conn.close()
+            with lock:
+                totals["reads"] += reads
+                totals["locked"] += locked
+                totals["latencies"] += latencies
+
+        def writer():
+            conn = self._connect(path, pragmas)
+            rng, writes, locked = random.Random(), 0, 0
+            while not stop.is_set():
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                    conn.execute(RATING_WRITE, (rng.choice(self.course_ids),))
+                    conn.execute("COMMIT")
+                    writes += 1
+                except sqlite3.OperationalError:
+                    locked += 1
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+            conn.close()
+            with lock:
+                totals["writes"] += writes
+                totals["locked"] += locked
+
+        threads = [threading.Thread(target=reader) for _ in range(options["readers"])]
+        threads += [threading.Thread(target=writer) for _ in range(options["writers"])]
+        for thread in threads:
+            thread.start()
+        time.sleep(options["seconds"])
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        latencies = sorted(totals.pop("latencies"))
+        totals["read_p95_ms"] = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0
+        return totals
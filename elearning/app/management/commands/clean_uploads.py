@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from app.uploads import clean_abandoned
+
+
+class Command(BaseCommand):
+    help = "Delete chunked uploads that were never attached, and their partial files; run it from cron."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-age", type=int,
+            help="Seconds an upload may sit untouched (defaults to CHUNKED_UPLOAD_EXPIRY).",
+        )
+
+    def handle(self, *args, **options):
+        deleted = clean_abandoned(options["max_age"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} abandoned uploads."))
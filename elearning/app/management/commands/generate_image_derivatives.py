@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from app.images import generate_derivatives
+from app.models import Course, User
+
+
+class Command(BaseCommand):
+    help = "Generate responsive thumbnail/avatar derivatives for existing uploads."
+
+    def handle(self, *args, **options):
+        names = set(
+            Course.objects.exclude(thumbnail_img="").exclude(thumbnail_img=None)
+            .values_list("thumbnail_img", flat=True)
+        ) | set(
+            User.objects.exclude(profile_picture="").exclude(profile_picture=None)
+            .values_list("profile_picture", flat=True)
+        )
+        for name in sorted(names):
+            try:
+                generate_derivatives(name)
+            except Exception as e:
+                self.stderr.write(f"{name}: {e}")
+        self.stdout.write(self.style.SUCCESS(f"Processed {len(names)} images."))
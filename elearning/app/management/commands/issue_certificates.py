@@ -0,0 +1,128 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from app.certificates import render_certificate_pdf
+from app.dashboard import invalidate_student_stats
+from app.models import Certificate, Enrollment, Job
+
+RENDER_TASK = "app.certificates.render_certificate_pdf"
+
+
+def _init_worker():
+    # Never share the parent's database connections across the fork
+    connections.close_all()
+
+
+def _render(certificate_id):
+    try:
+        render_certificate_pdf(certificate_id)
+    except Exception as e:
+        return certificate_id, f"{type(e).__name__}: {e}"
+    return certificate_id, None
+
+
+class Command(BaseCommand):
+    help = (
+        "Issue certificates for every enrollment in a certificate-offering course "
+        "that does not have one yet, rendering the PDFs in a process pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--course", type=int, action="append", help="Limit to these course ids.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+        parser.add_argument(
+            "--queue-size", type=int,
+            help="Maximum PDFs in flight at once (defaults to four per process).",
+        )
+        parser.add_argument(
+            "--defer-pdf", action="store_true",
+            help="Queue the PDFs for `run_jobs` instead of rendering them here.",
+        )
+
+    def handle(self, *args, **options):
+        self.issued = self.rendered = self.failed = 0
+        self.start = time.perf_counter()
+        # The join bypasses CourseManager, so skip soft-deleted courses here
+        pending = Enrollment.objects.filter(
+            certificate__isnull=True, course__offer_certificate=True, course__deleted_at__isnull=True,
+        ).order_by("pk")
+        if options["course"]:
+            pending = pending.filter(course_id__in=options["course"])
+
+        if options["defer_pdf"]:
+            for batch in self._issue(pending, options["batch_size"]):
+                Job.objects.bulk_create(
+                    Job(task=RENDER_TASK, payload={"certificate_id": pk}) for pk in batch
+                )
+        else:
+            self._issue_and_render(pending, options)
+
+        elapsed = time.perf_counter() - self.start
+        self.stdout.write(self.style.SUCCESS(
+            f"Issued {self.issued} certificates, rendered {self.rendered} PDFs "
+            f"({self.failed} failed) in {elapsed:.1f}s."
+        ))
+
+    def _issue(self, pending, batch_size):
+        """Insert certificates batch by batch, yielding the ids of those it inserted."""
+        last_pk = 0
+        while True:
+            rows = list(pending.filter(pk__gt=last_pk).values_list("pk", "user_id")[:batch_size])
+            if not rows:
+                return
+            last_pk = rows[-1][0]
+            enrollment_ids = [pk for pk, _ in rows]
+            certificates = [Certificate(enrollment_id=pk) for pk in enrollment_ids]
+            # A concurrent payment_success may issue (and queue the PDF of) one of
+            # these first. ignore_conflicts then skips it and leaves every primary
+            # key unset, so find this batch's rows by their fresh certificate_id
+            Certificate.objects.bulk_create(certificates, ignore_conflicts=True)
+            created = list(
+                Certificate.objects.filter(
+                    certificate_id__in=[certificate.certificate_id for certificate in certificates]
+                ).values_list("pk", flat=True)
+            )
+            self.issued += len(created)
+            for user_id in {user_id for _, user_id in rows}:
+                invalidate_student_stats(user_id)
+            self._progress()
+            yield created
+
+    def _issue_and_render(self, pending, options):
+        queue_size = options["queue_size"] or options["processes"] * 4
+        inflight = set()
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options["processes"], initializer=_init_worker) as pool:
+            for batch in self._issue(pending, options["batch_size"]):
+                for certificate_id in batch:
+                    # Bounded queue: block on the pool before submitting more
+                    while len(inflight) >= queue_size:
+                        inflight = self._collect(inflight)
+                    inflight.add(pool.submit(_render, certificate_id))
+            while inflight:
+                inflight = self._collect(inflight)
+
+    def _collect(self, inflight):
+        done, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+        for future in done:
+            certificate_id, error = future.result()
+            if error:
+                self.failed += 1
+                self.stderr.write(f"Certificate {certificate_id}: {error}")
+            else:
+                self.rendered += 1
+                if self.rendered % 100 == 0:
+                    self._progress()
+        return inflight
+
+    def _progress(self):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        self.stdout.write(
+            f"  issued {self.issued} ({self.issued / elapsed:.1f}/s), "
+            f"rendered {self.rendered} ({self.rendered / elapsed:.1f}/s), failed {self.failed}"
+        )
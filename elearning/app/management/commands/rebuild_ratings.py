@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from app.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized rating columns of every course from its reviews."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        total = rebuild_ratings(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt ratings for {total} courses."))
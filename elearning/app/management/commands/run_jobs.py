@@ -0,0 +1,75 @@
+import logging
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from app.jobs import claim, requeue_stale, run_job
+from app.models import Job
+
+logger = logging.getLogger(__name__)
+
+
+def _init_worker():
+    # Never share the parent's database connections across the fork
+    connections.close_all()
+
+
+def _run(job_id):
+    try:
+        return run_job(job_id)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (certificate PDFs, image derivatives, course purges) in a process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=2)
+        parser.add_argument("--poll-interval", type=float, default=1.0)
+        parser.add_argument(
+            "--requeue-interval", type=float, default=60.0,
+            help="Seconds between sweeps for jobs whose worker died mid-run.",
+        )
+        parser.add_argument("--once", action="store_true", help="Exit when the queue is empty.")
+
+    def handle(self, *args, **options):
+        processes = options["processes"]
+        next_sweep = 0
+
+        connections.close_all()
+        inflight = {}  # future -> job id
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker) as pool:
+            while True:
+                if time.monotonic() >= next_sweep:
+                    requeued = requeue_stale()
+                    if requeued:
+                        self.stdout.write(f"Requeued {requeued} stale jobs.")
+                    next_sweep = time.monotonic() + options["requeue_interval"]
+
+                # Keep at most two jobs per process in flight so claimed rows stay fresh
+                for job_id in claim(processes * 2 - len(inflight)):
+                    inflight[pool.submit(_run, job_id)] = job_id
+
+                if not inflight:
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll_interval"])
+                    continue
+
+                done, _ = wait(inflight, timeout=options["poll_interval"], return_when=FIRST_COMPLETED)
+                for future in done:
+                    job_id = inflight.pop(future)
+                    try:
+                        future.result()
+                    except Exception:
+                        # run_job records task errors itself; this is the worker or its
+                        # bookkeeping failing, so keep the loop alive and fail the job
+                        logger.exception("Worker crashed running job %s", job_id)
+                        Job.objects.filter(pk=job_id, status="running").update(
+                            status="failed", error=traceback.format_exc(), updated_at=timezone.now()
+                        )
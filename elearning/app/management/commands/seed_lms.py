@@ -0,0 +1,236 @@
+import random
+import uuid
+from datetime import timedelta
+from io import BytesIO
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from app.models import Certificate, Course, Enrollment, Lecture, Review, Section, User
+from app.ratings import rebuild_ratings
+from app.search import rebuild_index
+
+SEED_DOMAIN = "seed.lms"
+SEED_PASSWORD = "password"
+# Courses share a handful of placeholder thumbnails; templates expect one
+THUMBNAIL_COLORS = ((37, 99, 235), (22, 163, 74), (234, 88, 12), (147, 51, 234), (219, 39, 119), (13, 148, 136))
+
+WORDS = (
+    "python django web data science machine learning design marketing finance "
+    "excel photography music fitness leadership business javascript react cloud "
+    "security networks statistics writing drawing guitar yoga sql testing devops"
+).split()
+
+
+def _weights(value):
+    weights = [float(w) for w in value.split(",")]
+    if len(weights) != 5 or min(weights) < 0 or not sum(weights):
+        raise ValueError
+    return weights
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a deterministic synthetic LMS dataset (users, courses, curricula, "
+        f"enrollments, reviews, certificates) with bulk inserts. Seeded users log in "
+        f"as <role><n>@{SEED_DOMAIN} with password '{SEED_PASSWORD}'."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--instructors", type=int, default=20)
+        parser.add_argument("--students", type=int, default=1000)
+        parser.add_argument("--courses", type=int, default=200)
+        parser.add_argument("--sections", type=int, default=6, help="Mean sections per course.")
+        parser.add_argument("--lectures", type=int, default=5, help="Mean lectures per section.")
+        parser.add_argument("--enrollments", type=int, default=5, help="Mean enrollments per student.")
+        parser.add_argument(
+            "--popularity-skew", type=float, default=1.0,
+            help="Zipf exponent of course popularity; 0 spreads enrollments evenly.",
+        )
+        parser.add_argument("--published-rate", type=float, default=0.8)
+        parser.add_argument("--review-rate", type=float, default=0.3, help="Share of enrollments with a review.")
+        parser.add_argument(
+            "--rating-weights", type=_weights, default="5,8,17,35,35",
+            help="Relative frequency of 1..5 star ratings.",
+        )
+        parser.add_argument("--certificate-rate", type=float, default=0.4)
+        parser.add_argument("--days", type=int, default=365, help="Spread creation dates over this many days.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--flush", action="store_true", help="Delete previously seeded users and their data first.")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.now = timezone.now()
+        self.days = options["days"]
+
+        seeded = User.objects.filter(email__endswith=f"@{SEED_DOMAIN}")
+        if options["flush"]:
+            seeded.delete()
+        elif seeded.exists():
+            raise CommandError("Seeded data already exists; pass --flush to replace it.")
+
+        with transaction.atomic():
+            instructors, students = self._users(options)
+            courses = self._courses(instructors, options)
+            self._curriculum(courses, options)
+            enrollments = self._enrollments(students, courses, options)
+            self._reviews(enrollments, options)
+            self._certificates(enrollments, options)
+
+        # bulk_create skips the signals that keep these in sync
+        rebuild_index()
+        rebuild_ratings(batch_size=self.batch_size)
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS("Seeded LMS dataset."))
+
+    def _report(self, label, objs):
+        self.stdout.write(f"  {len(objs):>8} {label}")
+        return objs
+
+    def _past(self):
+        return self.now - timedelta(seconds=self.rng.randrange(self.days * 86400))
+
+    def _backdate(self, model, objs, field):
+        # auto_now_add overrides values passed to bulk_create, so backdate afterwards
+        for obj in objs:
+            setattr(obj, field, self._past())
+        model.objects.bulk_update(objs, [field], batch_size=self.batch_size)
+
+    def _users(self, options):
+        password = make_password(SEED_PASSWORD)  # hashing is slow; share one hash
+
+        def build(role, count):
+            return User.objects.bulk_create(
+                [
+                    User(
+                        username=f"{role}{n}.{SEED_DOMAIN}", email=f"{role}{n}@{SEED_DOMAIN}",
+                        full_name=f"{role.title()} {n}", role=role, password=password,
+                    )
+                    for n in range(count)
+                ],
+                batch_size=self.batch_size,
+            )
+
+        return (
+            self._report("instructors", build("instructor", options["instructors"])),
+            self._report("students", build("student", options["students"])),
+        )
+
+    def _courses(self, instructors, options):
+        if not instructors:
+            raise CommandError("At least one instructor is needed to own courses.")
+        thumbnails = self._thumbnails()
+        categories = [key for key, _ in Course.CATEGORIES]
+        levels = [key for key, _ in Course.LEVELS]
+        courses = []
+        for n in range(options["courses"]):
+            words = self.rng.sample(WORDS, 3)
+            courses.append(Course(
+                title=f"{' '.join(words).title()} {n}",
+                price=self.rng.choice((0, 499, 999, 1499, 1999, 2999)),
+                instructor=self.rng.choice(instructors),
+                category=self.rng.choice(categories),
+                level=self.rng.choice(levels),
+                is_published=self.rng.random() < options["published_rate"],
+                offer_certificate=self.rng.random() < 0.5,
+                description=" ".join(self.rng.choices(WORDS, k=40)),
+                requirements="\n".join(self.rng.sample(WORDS, 3)),
+                thumbnail_img=self.rng.choice(thumbnails),
+            ))
+        courses = Course.objects.bulk_create(courses, batch_size=self.batch_size)
+        self._backdate(Course, courses, "created_at")
+        return self._report("courses", courses)
+
+    def _thumbnails(self):
+        names = []
+        for n, color in enumerate(THUMBNAIL_COLORS):
+            name = f"thumbnail/{SEED_DOMAIN}-{n}.jpg"
+            if not default_storage.exists(name):
+                buffer = BytesIO()
+                Image.new("RGB", (1280, 720), color).save(buffer, "JPEG")
+                name = default_storage.save(name, ContentFile(buffer.getvalue()))
+            names.append(name)
+        return names
+
+    def _count(self, mean):
+        # Uniform around the mean keeps totals predictable while varying shape
+        return self.rng.randint(max(1, mean // 2), max(1, mean + mean // 2))
+
+    def _curriculum(self, courses, options):
+        sections = Section.objects.bulk_create(
+            [
+                Section(course=course, title=f"Section {order + 1}", order=order + 1)
+                for course in courses
+                for order in range(self._count(options["sections"]))
+            ],
+            batch_size=self.batch_size,
+        )
+        self._report("sections", sections)
+        lectures = Lecture.objects.bulk_create(
+            [
+                Lecture(
+                    section=section, title=f"Lecture {order + 1}", order=order + 1,
+                    description=" ".join(self.rng.choices(WORDS, k=12)),
+                    is_previewable=order == 0,
+                )
+                for section in sections
+                for order in range(self._count(options["lectures"]))
+            ],
+            batch_size=self.batch_size,
+        )
+        self._report("lectures", lectures)
+
+    def _enrollments(self, students, courses, options):
+        if not courses:
+            return []
+        skew = options["popularity_skew"]
+        popularity = [1 / (rank + 1) ** skew for rank in range(len(courses))]
+        enrollments = []
+        for student in students:
+            count = min(len(courses), self._count(options["enrollments"]))
+            picked = set()
+            while len(picked) < count:
+                picked.update(self.rng.choices(range(len(courses)), weights=popularity, k=count - len(picked)))
+            enrollments.extend(Enrollment(user=student, course=courses[i]) for i in sorted(picked))
+        enrollments = Enrollment.objects.bulk_create(enrollments, batch_size=self.batch_size)
+        self._backdate(Enrollment, enrollments, "purchased_at")
+        return self._report("enrollments", enrollments)
+
+    def _reviews(self, enrollments, options):
+        reviews = Review.objects.bulk_create(
+            [
+                Review(
+                    course_id=enrollment.course_id, user_id=enrollment.user_id,
+                    rating=self.rng.choices(range(1, 6), weights=options["rating_weights"])[0],
+                    comment=" ".join(self.rng.choices(WORDS, k=self.rng.randint(0, 30))),
+                )
+                for enrollment in enrollments
+                if self.rng.random() < options["review_rate"]
+            ],
+            batch_size=self.batch_size,
+        )
+        self._backdate(Review, reviews, "created_at")
+        self._report("reviews", reviews)
+
+    def _certificates(self, enrollments, options):
+        certificates = Certificate.objects.bulk_create(
+            [
+                Certificate(
+                    enrollment=enrollment,
+                    certificate_id=uuid.UUID(int=self.rng.getrandbits(128), version=4),
+                )
+                for enrollment in enrollments
+                if enrollment.course.offer_certificate
+                and self.rng.random() < options["certificate_rate"]
+            ],
+            batch_size=self.batch_size,
+        )
+        self._report("certificates", certificates)
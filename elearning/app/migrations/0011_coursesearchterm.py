@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_certificate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=50)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('category', models.CharField(max_length=50)),
+                ('level', models.CharField(max_length=20)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('is_published', models.BooleanField(default=False)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='app.course')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'is_published', 'category', 'level'], name='app_courses_term_5aa851_idx')],
+                'unique_together': {('term', 'course')},
+            },
+        ),
+    ]
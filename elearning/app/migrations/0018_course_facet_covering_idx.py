@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0017_course_published_recent_idx_id'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='course',
+            name='app_course_categor_401485_idx',
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['category', 'level', 'price', 'is_published'], name='app_course_categor_d65b4b_idx'),
+        ),
+    ]
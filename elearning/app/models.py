@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 import uuid
 # Create your models here.
 
@@ -24,6 +25,13 @@ class User(AbstractUser):
         return f"{self.email} - {self.role}"
 
 
+class CourseManager(models.Manager):
+    """Hides soft-deleted courses; foreign keys still reach them through the base manager."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Course(models.Model):
     LEVELS = [
         ('beginner', 'Beginner'),
@@ -65,12 +73,79 @@ class Course(models.Model):
     description = models.TextField(null=False)
     requirements = models.TextField(null=False)
 
+    # Denormalized review aggregates, maintained by app.ratings
+    rating_avg = models.FloatField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+
+    RATING_FIELDS = (
+        'rating_avg', 'rating_count', 'rating_sum',
+        'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5',
+    )
+
+    # Set when an instructor deletes the course; app.purge removes it later
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = CourseManager()
+    all_objects = models.Manager()
+
     class Meta:
         ordering = ['-created_at', '-updated_at']
+        indexes = [
+            # Partial rather than (is_published, created_at): SQLite renders
+            # is_published=True as a bare column test, which can only use an
+            # index whose WHERE clause matches it
+            models.Index(
+                fields=['-created_at', '-id'],
+                condition=models.Q(is_published=True),
+                name='course_published_recent_idx',
+            ),
+            models.Index(fields=['instructor', 'is_published']),
+            # Covers every facet column and the soft-delete filter, so facet
+            # counts scan this index instead of the table
+            models.Index(fields=['category', 'level', 'price', 'is_published', 'deleted_at']),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.instructor} - {self.price}"
 
+    def save(self, *args, **kwargs):
+        # Rating columns are only written with F() updates, never from a
+        # possibly stale instance loaded before the latest reviews came in.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.RATING_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+
+class CourseSearchTerm(models.Model):
+    # Inverted index row: one per (term, course), kept in sync by app.signals
+    term = models.CharField(max_length=50)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='search_terms')
+    weight = models.PositiveIntegerField(default=1)
+
+    # Copies of the course filter columns so search predicates never join Course
+    category = models.CharField(max_length=50)
+    level = models.CharField(max_length=20)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    is_published = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ('term', 'course')
+        indexes = [
+            models.Index(fields=['term', 'is_published', 'category', 'level']),
+        ]
+
+    def __str__(self):
+        return f"{self.term} -> {self.course_id} ({self.weight})"
+
 
 class Section(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='sections')
@@ -101,7 +176,30 @@ class Lecture(models.Model):
 
     def __str__(self):
         return f"Section {self.section.order} • Lecture {self.order}: {self.title}"
-    
+
+
+class ChunkedUpload(models.Model):
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('complete', 'Complete'),
+        ('attached', 'Attached'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='uploads')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    # Optional SHA-256 of the whole file, verified on finalize
+    checksum = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='uploading')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size}) - {self.status}"
+
+
 class Enrollment(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='enrollments')
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='enrollments')
@@ -125,17 +223,23 @@ class Review(models.Model):
     class Meta:
         unique_together = ("course", "user")  # one review per course per student
         ordering = ['-created_at']
+        indexes = [
+            # Matches the (created_at, id) keyset order of review_list
+            models.Index(fields=['course', '-created_at', '-id']),
+        ]
 
     def __str__(self):
         return f"{self.user.full_name} - {self.course.title} ({self.rating}★)"
 
     @staticmethod
     def course_rating_summary(course_id):
-        from django.db.models import Avg, Count
-        return Review.objects.filter(course_id=course_id).aggregate(
-            avg_rating=Avg("rating"),
-            total_reviews=Count("id")
-        )
+        summary = Course.objects.filter(pk=course_id).values(
+            "rating_avg", "rating_count"
+        ).first() or {"rating_avg": 0, "rating_count": 0}
+        return {
+            "avg_rating": summary["rating_avg"],
+            "total_reviews": summary["rating_count"],
+        }
 
 
 class Certificate(models.Model):
@@ -171,3 +275,52 @@ class Certificate(models.Model):
         ordering = ["-issued_at"]
         verbose_name = "Certificate"
         verbose_name_plural = "Certificates"
+
+
+class Job(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    # Dotted path of the function to call with ``payload`` as keyword arguments
+    task = models.CharField(max_length=200)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} - {self.status}"
+
+
+class Payment(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('complete', 'Complete'),
+        ('failed', 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='payments')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='payments')
+    transaction_uuid = models.CharField(max_length=100, unique=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    # Gateway reference and the callback signature we verified
+    transaction_code = models.CharField(max_length=100, blank=True)
+    signature = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.transaction_uuid} - {self.status}"
@@ -0,0 +1,123 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag, urlencode
+
+from .models import Course, Lecture, Section
+
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+
+def _validators(*parts, last_modified):
+    etag = quote_etag(hashlib.md5(repr(parts).encode()).hexdigest())
+    return etag, last_modified
+
+
+def catalog_validators(*args, **kwargs):
+    """
+    Validators for pages listing published courses, from one aggregate over
+    the published-course index. Counts catch deletions and unpublishing;
+    rating totals catch review changes, which do not touch updated_at.
+    """
+    stats = Course.objects.filter(is_published=True).aggregate(
+        last_modified=Max("updated_at"),
+        total=Count("pk"),
+        rating_count=Sum("rating_count"),
+        rating_sum=Sum("rating_sum"),
+    )
+    return _validators(*stats.values(), last_modified=stats["last_modified"])
+
+
+def _latest(model, course_path):
+    # Correlated (max updated_at, count) of a course's sections or lectures
+    rows = model.objects.filter(**{course_path: OuterRef("pk")}).order_by().values(course_path)
+    return (
+        Subquery(rows.annotate(value=Max("updated_at")).values("value")),
+        Subquery(rows.annotate(value=Count("pk")).values("value")),
+    )
+
+
+def course_validators(course_id, *args, **kwargs):
+    """
+    Validators for a course page: the course row, its instructor's name and
+    avatar, and its curriculum, in one query.
+    """
+    section_modified, section_count = _latest(Section, "course")
+    lecture_modified, lecture_count = _latest(Lecture, "section__course")
+    row = (
+        Course.objects.filter(pk=course_id, is_published=True)
+        .values(
+            "updated_at", "rating_count", "rating_sum",
+            "instructor__full_name", "instructor__username", "instructor__profile_picture",
+        )
+        .annotate(
+            section_modified=section_modified, section_count=section_count,
+            lecture_modified=lecture_modified, lecture_count=lecture_count,
+        )
+        .first()
+    )
+    if row is None:
+        return None
+    last_modified = max(filter(None, (row["updated_at"], row["section_modified"], row["lecture_modified"])))
+    return _validators(course_id, *row.values(), last_modified=last_modified)
+
+
+def _anonymous(request):
+    # Decided from cookies alone, so anonymous hits never load a session
+    return not (
+        settings.SESSION_COOKIE_NAME in request.COOKIES
+        or CookieStorage.cookie_name in request.COOKIES
+    )
+
+
+def _page_key(request, query_params, etag):
+    # Only parameters the view reads, so junk query strings share one entry
+    query = urlencode(
+        [(name, request.GET.getlist(name)) for name in query_params if name in request.GET], doseq=True
+    )
+    return f"page:{request.path}?{query}:{etag}"
+
+
+def cache_anonymous_page(validators, query_params=()):
+    """
+    Serve a view with ETag/Last-Modified from ``validators(*args, **kwargs)``
+    and answer 304 when the visitor's copy is current. For visitors without
+    a session, whole 200 responses are cached under the ETag, so any change
+    to the underlying courses moves readers to a fresh key at once.
+    ``query_params`` names the GET parameters the view reads.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD") or not _anonymous(request):
+                return view(request, *args, **kwargs)
+            result = validators(*args, **kwargs)
+            if result is None:
+                return view(request, *args, **kwargs)
+            etag, last_modified = result
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                key = _page_key(request, query_params, etag)
+                response = cache.get(key)
+                if response is None:
+                    response = view(request, *args, **kwargs)
+                    # A response setting cookies (CSRF, messages) is per-visitor
+                    if response.status_code == 200 and not response.streaming and not response.cookies:
+                        cache.set(key, response, PAGE_CACHE_TIMEOUT)
+
+            response.headers.setdefault("ETag", etag)
+            if timestamp:
+                response.headers.setdefault("Last-Modified", http_date(timestamp))
+            # Revalidate on every visit; 304s are nearly free
+            patch_cache_control(response, max_age=0)
+            patch_vary_headers(response, ("Cookie",))
+            return response
+        return wrapper
+    return decorator
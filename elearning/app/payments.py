@@ -0,0 +1,70 @@
+import base64
+import hashlib
+import hmac
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Certificate, Enrollment, Payment
+
+ESEWA_SECRET_KEY = settings.ESEWA_SECRET_KEY.encode()
+ESEWA_PRODUCT_CODE = settings.ESEWA_PRODUCT_CODE
+
+
+def sign(fields, values):
+    """eSewa signature: base64 HMAC-SHA256 over ``name=value`` pairs of ``fields``."""
+    message = ",".join(f"{name}={values[name]}" for name in fields)
+    digest = hmac.new(ESEWA_SECRET_KEY, message.encode("utf-8"), hashlib.sha256).digest()
+    return base64.b64encode(digest).decode("utf-8")
+
+
+def decode_callback(data):
+    """Decode and verify the base64 ``data`` eSewa appends to the success URL."""
+    try:
+        payload = json.loads(base64.b64decode(data).decode("utf-8"))
+        fields = payload["signed_field_names"].split(",")
+        expected = sign(fields, payload)
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+    if not hmac.compare_digest(expected, str(payload.get("signature", ""))):
+        return None
+    return payload
+
+
+def record_callback(user, course, payload):
+    """
+    Apply a verified success callback exactly once.
+
+    Only a pending payment that ``process_payment`` created for ``user`` and
+    ``course``, at the amount it recorded, can be completed: one conditional
+    UPDATE flips it. A retried or reloaded callback matches no pending row
+    and returns the completed payment without touching enrollments. Anything
+    else, including a self-signed payload for a transaction we never started,
+    returns None.
+    """
+    if payload.get("status") != "COMPLETE" or payload.get("product_code") != ESEWA_PRODUCT_CODE:
+        return None
+    try:
+        amount = Decimal(str(payload["total_amount"]).replace(",", ""))
+    except (KeyError, InvalidOperation):
+        return None
+    ours = Payment.objects.filter(
+        transaction_uuid=payload.get("transaction_uuid"), user=user, course=course, amount=amount,
+    )
+
+    with transaction.atomic():
+        updated = ours.filter(status="pending").update(
+            status="complete",
+            transaction_code=payload.get("transaction_code", ""),
+            signature=payload["signature"],
+        )
+        if not updated:
+            # Duplicate callback: already applied, or not ours to apply
+            return ours.filter(status="complete").first()
+
+        enrollment, _ = Enrollment.objects.get_or_create(user=user, course=course)
+        if course.offer_certificate:
+            Certificate.objects.get_or_create(enrollment=enrollment)
+    return ours.get()
@@ -0,0 +1,100 @@
+import time
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .dashboard import invalidate_student_stats
+from .images import DERIVATIVE_FORMATS, DERIVATIVE_WIDTHS, derivative_name
+from .jobs import enqueue
+from .models import Certificate, Course, Enrollment, Lecture, Payment, Review, Section
+
+PURGE_BATCH_SIZE = 200
+# Pause between batches so request transactions get the write lock in between
+PURGE_BATCH_PAUSE = 0.1
+# A purge job hands over to a fresh job after this long, well inside the
+# `run_jobs` stale timeout
+PURGE_JOB_SECONDS = 60
+
+
+def soft_delete_course(course):
+    """
+    Hide ``course`` at once and queue its purge. The course drops out of
+    every listing, search and lookup through ``Course.objects``; rows and
+    files are removed later by ``purge_course`` in a `run_jobs` worker.
+    """
+    with transaction.atomic():
+        course.deleted_at = timezone.now()
+        course.is_published = False
+        course.save(update_fields=["deleted_at", "is_published", "updated_at"])
+        enqueue("app.purge.purge_course", course_id=course.pk)
+        # The course stops counting towards its students' dashboard stats
+        user_ids = list(Enrollment.objects.filter(course=course).values_list("user_id", flat=True))
+        transaction.on_commit(lambda: invalidate_student_stats(*user_ids))
+
+
+def _unreferenced(names, model, field):
+    """The subset of ``names`` no remaining ``model`` row points at."""
+    names = {name for name in names if name}
+    if not names:
+        return set()
+    used = model._base_manager.filter(**{f"{field}__in": names}).values_list(field, flat=True)
+    return names - set(used)
+
+
+def _delete_files(names):
+    for name in names:
+        if default_storage.exists(name):
+            default_storage.delete(name)
+
+
+def _batches(queryset, model, file_fields=()):
+    """
+    Delete the rows of ``queryset`` one bounded batch at a time, each in its
+    own transaction, and then the files only they referenced. Yields after
+    every batch.
+    """
+    while True:
+        rows = list(queryset.values("pk", *file_fields)[:PURGE_BATCH_SIZE])
+        if not rows:
+            return
+        with transaction.atomic():
+            model.objects.filter(pk__in=[row["pk"] for row in rows]).delete()
+        for field in file_fields:
+            _delete_files(_unreferenced([row[field] for row in rows], model, field))
+        yield
+
+
+def purge_course(course_id):
+    """
+    Remove a soft-deleted course: certificates, reviews, payments,
+    enrollments, lectures and sections in small batches, then the course
+    row and every media file nothing else references. Runs until
+    ``PURGE_JOB_SECONDS`` pass and queues a follow-up job for the rest.
+    """
+    course = Course.all_objects.filter(pk=course_id, deleted_at__isnull=False).first()
+    if course is None:
+        return  # already purged
+
+    steps = (
+        _batches(Certificate.objects.filter(enrollment__course_id=course_id), Certificate, ("pdf_file",)),
+        _batches(Review.objects.filter(course_id=course_id), Review),
+        _batches(Payment.objects.filter(course_id=course_id), Payment),
+        _batches(Enrollment.objects.filter(course_id=course_id), Enrollment),
+        _batches(Lecture.objects.filter(section__course_id=course_id), Lecture, ("video", "resource_file")),
+        _batches(Section.objects.filter(course_id=course_id), Section),
+    )
+    deadline = time.monotonic() + PURGE_JOB_SECONDS
+    for step in steps:
+        for _ in step:
+            if time.monotonic() > deadline:
+                enqueue("app.purge.purge_course", course_id=course_id)
+                return
+            time.sleep(PURGE_BATCH_PAUSE)
+
+    thumbnail = course.thumbnail_img.name
+    course.delete()  # only search terms are left to cascade
+    for name in _unreferenced([thumbnail], Course, "thumbnail_img"):
+        _delete_files([name, *(
+            derivative_name(name, width, ext) for width in DERIVATIVE_WIDTHS for ext, _, _ in DERIVATIVE_FORMATS
+        )])
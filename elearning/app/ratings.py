@@ -0,0 +1,83 @@
+from django.db.models import Count, F, FloatField, Q, Sum
+from django.db.models.functions import Cast, Greatest
+
+from .models import Course, Review
+
+MIN_RATING = 1
+MAX_RATING = 5
+
+
+def apply_rating_change(course_id, old=None, new=None):
+    """
+    Fold one review change into the course's rating columns in a single UPDATE.
+
+    ``old`` is the rating being removed (update/delete) and ``new`` the rating
+    being added (create/update). The average is computed in SQL from the
+    pre-update values, so concurrent writers never read-modify-write.
+    """
+    if old == new:
+        return
+    count_delta = (new is not None) - (old is not None)
+    sum_delta = (new or 0) - (old or 0)
+    changes = {}
+    if old is not None:
+        changes[f"rating_{old}"] = F(f"rating_{old}") - 1
+    if new is not None:
+        changes[f"rating_{new}"] = F(f"rating_{new}") + 1
+    if count_delta:
+        changes["rating_count"] = F("rating_count") + count_delta
+    if sum_delta:
+        changes["rating_sum"] = F("rating_sum") + sum_delta
+    changes["rating_avg"] = (
+        Cast(F("rating_sum") + sum_delta, FloatField())
+        / Greatest(F("rating_count") + count_delta, 1)
+    )
+    Course.objects.filter(pk=course_id).update(**changes)
+
+
+def rebuild_ratings(batch_size=500):
+    """Recompute every course's rating columns from the reviews table."""
+    total = 0
+    course_ids = Course.objects.order_by("pk").values_list("pk", flat=True)
+    batch = []
+    for course_id in course_ids.iterator(chunk_size=batch_size):
+        batch.append(course_id)
+        if len(batch) >= batch_size:
+            total += _rebuild_batch(batch)
+            batch = []
+    if batch:
+        total += _rebuild_batch(batch)
+    return total
+
+
+def _rebuild_batch(course_ids):
+    stats = {
+        row["course_id"]: row
+        for row in Review.objects.filter(course_id__in=course_ids)
+        .values("course_id")
+        .annotate(
+            total=Count("id"),
+            rating_total=Sum("rating"),
+            **{
+                f"stars_{stars}": Count("id", filter=Q(rating=stars))
+                for stars in range(MIN_RATING, MAX_RATING + 1)
+            },
+        )
+        .order_by()
+    }
+    courses = []
+    for course_id in course_ids:
+        row = stats.get(course_id, {})
+        count = row.get("total", 0)
+        rating_sum = row.get("rating_total") or 0
+        course = Course(
+            pk=course_id,
+            rating_count=count,
+            rating_sum=rating_sum,
+            rating_avg=rating_sum / count if count else 0,
+        )
+        for stars in range(MIN_RATING, MAX_RATING + 1):
+            setattr(course, f"rating_{stars}", row.get(f"stars_{stars}", 0))
+        courses.append(course)
+    Course.objects.bulk_update(courses, Course.RATING_FIELDS)
+    return len(courses)
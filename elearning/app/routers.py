@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+READ_ONLY_ALIAS = "readonly"
+
+# Read-mostly catalog tables served from the read-only connection
+CATALOG_MODELS = {"course", "coursesearchterm", "section", "lecture", "review"}
+
+
+class ReadOnlyCatalogRouter:
+    """
+    Route catalog reads to the ``readonly`` alias when it is configured, and
+    every write to the primary connection.
+    """
+
+    def db_for_read(self, model, **hints):
+        if READ_ONLY_ALIAS not in settings.DATABASES:
+            return None
+        if model._meta.app_label != "app" or model._meta.model_name not in CATALOG_MODELS:
+            return None
+        # Inside a transaction the primary must see its own uncommitted writes
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return READ_ONLY_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Without this, saving an instance read from the replica would target it
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases are the same database file
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == READ_ONLY_ALIAS:
+            return False
+        return None
@@ -0,0 +1,118 @@
+import re
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, IntegerField, Max, Q, Sum, When
+
+from .models import Course, CourseSearchTerm
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+MAX_TERM_LENGTH = 50
+
+# How much a hit in each field counts towards a course's relevance score
+FIELD_WEIGHTS = (
+    ("title", 10),
+    ("instructor", 5),
+    ("description", 1),
+)
+
+
+def tokenize(text):
+    return [
+        token.lower()
+        for token in TOKEN_RE.findall(text or "")
+        if len(token) <= MAX_TERM_LENGTH
+    ]
+
+
+def _field_text(course, field):
+    if field == "instructor":
+        return course.instructor.username
+    return getattr(course, field)
+
+
+def index_course(course):
+    """Rebuild the search terms of a single course."""
+    weights = Counter()
+    # Soft-deleted courses keep no terms, so search drops them at once
+    if course.deleted_at is None:
+        for field, weight in FIELD_WEIGHTS:
+            for term in tokenize(_field_text(course, field)):
+                weights[term] += weight
+
+    rows = [
+        CourseSearchTerm(
+            term=term,
+            course=course,
+            weight=weight,
+            category=course.category,
+            level=course.level,
+            price=course.price,
+            is_published=course.is_published,
+        )
+        for term, weight in weights.items()
+    ]
+    with transaction.atomic():
+        CourseSearchTerm.objects.filter(course=course).delete()
+        CourseSearchTerm.objects.bulk_create(rows)
+
+
+def rebuild_index(batch_size=500):
+    """Re-index every course, returns the number of courses indexed."""
+    total = 0
+    courses = Course.objects.select_related("instructor").order_by("pk")
+    for course in courses.iterator(chunk_size=batch_size):
+        index_course(course)
+        total += 1
+    return total
+
+
+def _prefix_q(token):
+    # A range instead of LIKE so SQLite can walk the term index
+    return Q(term__gte=token, term__lt=token + "\uffff")
+
+
+def ranked_course_ids(query, category="", level="", instructor="",
+                      price_min=None, price_max=None, published=""):
+    """
+    Return a ``values()`` queryset of ``{"course_id", "score"}`` rows for
+    courses matching every token of ``query``, best match first.
+
+    Each token matches indexed terms by prefix so partially typed words hit.
+    """
+    tokens = list(dict.fromkeys(tokenize(query)))
+    if not tokens:
+        return CourseSearchTerm.objects.none().values("course_id")
+
+    hits = CourseSearchTerm.objects.all()
+    if category:
+        hits = hits.filter(category=category)
+    if level:
+        hits = hits.filter(level=level)
+    if price_min:
+        hits = hits.filter(price__gte=price_min)
+    if price_max:
+        hits = hits.filter(price__lte=price_max)
+    if published == "yes":
+        hits = hits.filter(is_published=True)
+    elif published == "no":
+        hits = hits.filter(is_published=False)
+    if instructor:
+        hits = hits.filter(course__instructor__username__icontains=instructor)
+
+    any_token = Q()
+    for token in tokens:
+        any_token |= _prefix_q(token)
+    hits = hits.filter(any_token)
+
+    matched = sum(
+        Max(Case(When(_prefix_q(token), then=1), default=0, output_field=IntegerField()))
+        for token in tokens
+    )
+    return (
+        hits.values("course_id")
+        .annotate(score=Sum("weight"), matched=matched)
+        .filter(matched=len(tokens))
+        .order_by("-score", "-course_id")
+        .values("course_id", "score")
+    )
@@ -0,0 +1,123 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import autocomplete
+from .dashboard import invalidate_student_stats
+from .db import apply_pragmas, is_read_only, sqlite_pragmas
+from .entitlements import invalidate_entitlements
+from .facets import bump_facet_version
+from .images import schedule_derivatives
+from .jobs import enqueue
+from .models import Certificate, Course, Enrollment, Review, User
+from .search import index_course
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            apply_pragmas(cursor, sqlite_pragmas(read_only=is_read_only(connection)))
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def course_facets_changed(sender, **kwargs):
+    bump_facet_version()
+
+
+@receiver(post_save, sender=Course)
+def reindex_course(sender, instance, raw=False, **kwargs):
+    # Loaddata passes raw=True; the index is rebuilt by `rebuild_search_index`
+    if raw:
+        return
+    index_course(instance)
+
+
+IMAGE_FIELDS = {Course: "thumbnail_img", User: "profile_picture"}
+
+
+@receiver(post_init, sender=Course)
+@receiver(post_init, sender=User)
+def remember_image_name(sender, instance, **kwargs):
+    # Deferred columns are missing from __dict__; reading them would query
+    value = instance.__dict__.get(IMAGE_FIELDS[sender])
+    instance._saved_image_name = getattr(value, "name", value)
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=User)
+def queue_image_derivatives(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Course.save lists every column in update_fields, so compare the name instead
+    field = IMAGE_FIELDS[sender]
+    if raw or (update_fields is not None and field not in update_fields):
+        return
+    name = getattr(instance, field).name
+    if name and name != instance._saved_image_name:
+        # Written in the saving transaction, so the job exists once the file is referenced
+        schedule_derivatives(name)
+    instance._saved_image_name = name
+
+
+# Autocomplete indexes live in each process; follow only committed writes and
+# tell the other processes through the shared version
+
+@receiver(post_save, sender=Course)
+def course_autocomplete(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: autocomplete.update_course(instance))
+
+
+@receiver(post_delete, sender=Course)
+def course_autocomplete_removed(sender, instance, **kwargs):
+    course_id = instance.pk  # cleared by delete() before the commit
+    transaction.on_commit(lambda: autocomplete.remove_course(course_id))
+
+
+@receiver(post_save, sender=User)
+def instructor_autocomplete(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Logins save last_login alone; only name changes reach the index
+    if update_fields is not None and not {"full_name", "username"} & set(update_fields):
+        return
+    if not raw and instance.role == "instructor":
+        transaction.on_commit(lambda: autocomplete.update_instructor(instance))
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def enrollment_changed(sender, instance, created=True, **kwargs):
+    # post_delete sends no `created`; every delete changes the enrolled set
+    if created:
+        # After commit, so a concurrent read cannot re-cache the old set
+        transaction.on_commit(lambda: invalidate_entitlements(instance.user_id))
+        transaction.on_commit(lambda: invalidate_student_stats(instance.user_id))
+
+
+@receiver(post_save, sender=Certificate)
+@receiver(post_delete, sender=Certificate)
+def certificate_changed(sender, instance, **kwargs):
+    if Certificate.enrollment.is_cached(instance):
+        user_id = instance.enrollment.user_id
+    else:
+        # During a cascade the enrollment row may already be gone; its own
+        # post_delete then invalidates the stats
+        user_id = Enrollment.objects.filter(pk=instance.enrollment_id).values_list(
+            "user_id", flat=True
+        ).first()
+    if user_id:
+        transaction.on_commit(lambda: invalidate_student_stats(user_id))
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def review_changed(sender, instance, created=True, **kwargs):
+    # Edits keep the count; only new and deleted reviews change it
+    if created:
+        transaction.on_commit(lambda: invalidate_student_stats(instance.user_id))
+
+
+@receiver(post_save, sender=Certificate)
+def queue_certificate_pdf(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        enqueue("app.certificates.render_certificate_pdf", certificate_id=instance.pk)
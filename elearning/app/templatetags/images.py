@@ -0,0 +1,43 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+from ..images import DERIVATIVE_FORMATS, DERIVATIVE_WIDTHS, derivative_name, derivatives_ready
+
+register = template.Library()
+
+
+def _srcset(name, ext):
+    return ", ".join(
+        f"{default_storage.url(derivative_name(name, width, ext))} {width}w"
+        for width in DERIVATIVE_WIDTHS
+    )
+
+
+@register.simple_tag
+def responsive_img(image, alt="", css_class="", sizes="100vw"):
+    """
+    Render ``image`` as a <picture> with WebP and JPEG srcsets, or as a plain
+    <img> of the original upload until its derivatives have been generated.
+    """
+    if not image:
+        return ""
+    if not derivatives_ready(image.name):
+        return format_html('<img src="{}" alt="{}" class="{}" loading="lazy">', image.url, alt, css_class)
+
+    # Every format but the last becomes a <source>; the last is the <img> fallback
+    *modern, (fallback_ext, _, _) = DERIVATIVE_FORMATS
+    sources = format_html_join(
+        "",
+        '<source type="{}" srcset="{}" sizes="{}">',
+        ((mime, _srcset(image.name, ext), sizes) for ext, _, mime in modern),
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="lazy"></picture>',
+        sources,
+        image.url,
+        _srcset(image.name, fallback_ext),
+        sizes,
+        alt,
+        css_class,
+    )
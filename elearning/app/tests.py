@@ -1,3 +1,1535 @@
-from django.test import TestCase
+import base64
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from django.http import FileResponse
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import urls as app_urls
+from .autocomplete import AUTOCOMPLETE_VERSION_KEY, reset_index, suggest
+from .budgets import QueryRecorder
+from .jobs import MAX_ATTEMPTS, STALE_AFTER, claim, requeue_stale, run_job
+from .models import (
+    Certificate, ChunkedUpload, Course, CourseSearchTerm, Enrollment, Job, Lecture, Payment, Review, Section, User,
+)
+from .payments import ESEWA_PRODUCT_CODE, sign
+from .purge import soft_delete_course
+from .routers import READ_ONLY_ALIAS, ReadOnlyCatalogRouter
+from .uploads import part_path
+from .catalog import encode_cursor
+from .curriculum import get_curriculum
+from .dashboard import student_stats
+from .facets import afacet_counts
+from .entitlements import ais_enrolled, enrolled_course_ids, is_enrolled
+from .images import derivatives_ready
+from .ratings import apply_rating_change
+from .search import ranked_course_ids
+
+# The file cache outlives a test run; give the tests their own, so neither
+# entries from a previous run nor the development server's can leak in
+_test_cache = override_settings(CACHES={
+    "default": {**settings.CACHES["default"], "LOCATION": tempfile.mkdtemp()},
+})
+
+
+def setUpModule():
+    _test_cache.enable()
+
+
+def tearDownModule():
+    _test_cache.disable()
+
+
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN is SQLite syntax")
+class QueryPlanTests(TestCase):
+    """
+    Run EXPLAIN QUERY PLAN on the SQL the hot views really issue and fail
+    when a query on a hot table falls back to a table scan or a sort.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user(
+            username="instructor", email="instructor@example.com", password="pass",
+            full_name="Instructor", role="instructor",
+        )
+        cls.student = User.objects.create_user(
+            username="student", email="student@example.com", password="pass",
+            full_name="Student",
+        )
+        cls.course = Course.objects.create(
+            title="Python Basics", price=10, instructor=cls.instructor, is_published=True,
+            description="Learn Python", requirements="None",
+            category="development", level="beginner",
+        )
+        Review.objects.create(course=cls.course, user=cls.student, rating=5, comment="Great")
+
+    def explain(self, url):
+        """Return ``(sql, plan details)`` for every SELECT issued while serving ``url``."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        plans = []
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                if not query["sql"].startswith("SELECT"):
+                    continue
+                cursor.execute("EXPLAIN QUERY PLAN " + query["sql"])
+                plans.append((query["sql"], [row[-1] for row in cursor.fetchall()]))
+        return plans
+
+    def assertIndexed(self, url, table, ordered=True):
+        """
+        Every query reading ``table`` must search it through an index; with
+        ``ordered`` its ORDER BY must also come from the index, not a sort.
+        """
+        plans = [(sql, plan) for sql, plan in self.explain(url) if f'FROM "{table}"' in sql]
+        self.assertTrue(plans, f"{url} issued no query on {table}")
+        for sql, plan in plans:
+            details = "\n".join(plan)
+            self.assertNotRegex(
+                details, re.compile(rf"^SCAN {table}$", re.M), f"full scan of {table}:\n{details}\n{sql}"
+            )
+            if ordered:
+                self.assertNotRegex(
+                    details, re.compile("^USE TEMP B-TREE FOR .*ORDER BY", re.M),
+                    f"{table} rows sorted outside the index:\n{details}\n{sql}",
+                )
+
+    def test_home_recent_courses(self):
+        self.assertIndexed(reverse("home"), "app_course")
+
+    def test_published_courses(self):
+        self.assertIndexed(reverse("published_courses"), "app_course")
+
+    def test_published_courses_cursor(self):
+        cursor = encode_cursor(self.course.created_at, self.course.pk + 1)
+        self.assertIndexed(reverse("published_courses") + f"?cursor={cursor}", "app_course")
+
+    def test_instructor_dashboard(self):
+        self.client.force_login(self.instructor)
+        self.assertIndexed(reverse("instructor_dashboard"), "app_course", ordered=False)
+
+    def test_search_filters(self):
+        url = reverse("search_course") + "?category=development&level=beginner&price_min=5"
+        self.assertIndexed(url, "app_course", ordered=False)
+
+    def test_search_ranked(self):
+        url = reverse("search_course") + "?q=pyth&category=development"
+        self.assertIndexed(url, "app_coursesearchterm", ordered=False)
+
+    def test_review_list(self):
+        url = reverse("review_list", args=[self.course.pk])
+        self.assertIndexed(url, "app_review")
+
+    def test_review_list_cursor(self):
+        review = self.course.reviews.get()
+        cursor = encode_cursor(review.created_at, review.pk)
+        url = reverse("review_list", args=[self.course.pk]) + f"?cursor={cursor}"
+        self.assertIndexed(url, "app_review")
+
+
+class _Rollback(Exception):
+    pass
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), CHUNKED_UPLOAD_DIR=tempfile.mkdtemp())
+class QueryBudgetTests(TestCase):
+    """
+    Crawl every route in app/urls.py as an anonymous visitor, a student and
+    an instructor against seeded data, and fail when a view spends more
+    queries or SQL time than its ``@query_budget`` allows. Routes that write
+    are also sent a valid POST.
+    """
+
+    CHUNK = b"0123456789"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user(
+            username="instructor", email="instructor@example.com", password="pass",
+            full_name="Instructor", role="instructor",
+        )
+        cls.student = User.objects.create_user(
+            username="student", email="student@example.com", password="pass",
+            full_name="Student",
+        )
+        courses = [
+            Course.objects.create(
+                title=f"Course {n}", price=10 + n, instructor=cls.instructor, is_published=True,
+                offer_certificate=True, description="Learn things", requirements="None\nMore",
+                category="development", level="beginner", thumbnail_img=f"thumbnail/course-{n}.jpg",
+            )
+            for n in range(4)
+        ]
+        cls.course = courses[0]
+        for n in range(3):
+            section = Section.objects.create(course=cls.course, title=f"Section {n}", order=n)
+            for m in range(3):
+                Lecture.objects.create(section=section, title=f"Lecture {m}", order=m, is_previewable=m == 0)
+        cls.section, cls.lecture = section, section.lectures.first()
+
+        for course in courses:
+            enrollment = Enrollment.objects.create(user=cls.student, course=course)
+            Certificate.objects.create(enrollment=enrollment)
+        for n in range(5):
+            reviewer = User.objects.create_user(
+                username=f"reviewer{n}", email=f"reviewer{n}@example.com", password="pass",
+                full_name=f"Reviewer {n}",
+            )
+            Review.objects.create(course=cls.course, user=reviewer, rating=n % 5 + 1, comment="Fine")
+            apply_rating_change(cls.course.pk, new=n % 5 + 1)
+        cls.review = Review.objects.create(course=cls.course, user=cls.student, rating=4, comment="Good")
+        apply_rating_change(cls.course.pk, new=4)
+        cls.upload = ChunkedUpload.objects.create(user=cls.student, filename="video.mp4", size=len(cls.CHUNK))
+        # Finalizing needs every byte in, which the chunk route's upload lacks
+        cls.received_upload = ChunkedUpload.objects.create(
+            user=cls.student, filename="notes.pdf", size=len(cls.CHUNK), received=len(cls.CHUNK),
+        )
+
+    def route_kwargs(self, pattern):
+        values = {
+            "course_id": self.course.pk,
+            "section_id": self.section.pk,
+            "lecture_id": self.lecture.pk,
+            "review_id": self.review.pk,
+            "upload_id": self.received_upload.pk if pattern.name == "upload_finalize" else self.upload.pk,
+        }
+        return {name: values[name] for name in pattern.pattern.converters}
+
+    def post_data(self, name):
+        """Client.post() arguments making a valid write to route ``name``, or None."""
+        course_form = {
+            "title": "Course", "price": "10", "category": "development", "level": "beginner",
+            "description": "Learn things", "requirements": "None",
+        }
+        return {
+            "login": {"data": {"email": "student@example.com", "password": "pass"}},
+            "register": {"data": {
+                "fullname": "New", "username": "new", "email": "new@example.com", "role": "student", "password": "pass",
+            }},
+            "profile": {"data": {"full_name": "Renamed", "email": "renamed@example.com", "bio": "Hi"}},
+            "change_password": {"data": {
+                "current_password": "pass", "new_password": "new-pass", "confirm_password": "new-pass",
+            }},
+            "create_courses": {"data": course_form},
+            "edit_courses": {"data": course_form},
+            "delete_courses": {"data": {}},
+            "create_section": {"data": {"title": "Section", "order": "10"}},
+            "create_lecture": {"data": {
+                "title": "Lecture", "order": "10", "video": SimpleUploadedFile("video.mp4", self.CHUNK),
+            }},
+            "curriculum_batch": {
+                "data": {
+                    "sections": {
+                        "create": [{"ref": "s", "title": "New", "after": None}],
+                        "update": [{"id": self.section.pk, "title": "Renamed"}],
+                    },
+                    "lectures": {
+                        "create": [{"ref": "l", "section": "s", "title": "New"}],
+                        "update": [{"id": self.lecture.pk, "section": "s"}],
+                    },
+                },
+                "content_type": "application/json",
+            },
+            "upload_init": {"data": {"filename": "video.mp4", "size": "10"}},
+            "upload_chunk": {
+                "data": self.CHUNK,
+                "content_type": "application/octet-stream",
+                "query_params": {"offset": 0},
+                "headers": {"X-Chunk-Checksum": hashlib.sha256(self.CHUNK).hexdigest()},
+            },
+            "upload_finalize": {"data": {}},
+            "review_create": {"data": {"rating": "5", "comment": "Great"}},
+            "review_update": {"data": {"rating": "3", "comment": "Fine"}},
+            "review_delete": {"data": {}},
+        }.get(name)
+
+    def fetch(self, url, user, **post):
+        """
+        GET ``url`` (or POST ``post`` to it) as ``user`` from a cold cache,
+        rolling back any writes.
+        """
+        cache.clear()
+        self.client.logout()
+        if user:
+            self.client.force_login(user)
+        recorder = QueryRecorder()
+        try:
+            with transaction.atomic(), connection.execute_wrapper(recorder):
+                if post:
+                    self.client.post(url, **post)
+                else:
+                    self.client.get(url)
+                raise _Rollback
+        except _Rollback:
+            pass
+        return recorder
+
+    def test_routes_within_query_budget(self):
+        for pattern in app_urls.urlpatterns:
+            url = reverse(pattern.name, kwargs=self.route_kwargs(pattern))
+            budget = getattr(pattern.callback, "query_budget", None)
+            with self.subTest(route=pattern.name):
+                self.assertIsNotNone(budget, f"{pattern.name} declares no @query_budget")
+                for user in (None, self.student, self.instructor):
+                    for method, post in (("GET", {}), ("POST", self.post_data(pattern.name))):
+                        if post is None:
+                            continue
+                        report = self.fetch(url, user, **post).check(budget)
+                        if report:
+                            self.fail(f"{method} {url} as {user or 'anonymous'}: {report}")
+
+    def test_write_routes_succeed(self):
+        # A rejected payload would only measure the error path
+        for pattern in app_urls.urlpatterns:
+            post = self.post_data(pattern.name)
+            if post is None:
+                continue
+            user = self.student if pattern.name.startswith(("upload", "review", "change_password")) else self.instructor
+            with self.subTest(route=pattern.name), transaction.atomic():
+                self.client.force_login(user)
+                response = self.client.post(reverse(pattern.name, kwargs=self.route_kwargs(pattern)), **post)
+                self.assertLess(response.status_code, 400, response.content)
+                if response.get("Content-Type") == "application/json":
+                    self.assertTrue(response.json()["success"], response.content)
+                transaction.set_rollback(True)
+
+
+@skipUnless(connection.vendor == "sqlite", "PRAGMAs are SQLite syntax")
+class SqlitePragmaTests(SimpleTestCase):
+    def open(self, name):
+        """Open a fresh connection to the SQLite file ``name``, as a new worker would."""
+        wrapper = SQLiteDatabaseWrapper({**connection.settings_dict, "NAME": name}, alias="pragma_test")
+        wrapper.ensure_connection()
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            return cursor.execute(f"PRAGMA {name}").fetchone()[0]
+
+    def test_new_connections_get_the_pragmas(self):
+        wrapper = self.open(os.path.join(tempfile.mkdtemp(), "db.sqlite3"))
+        self.assertEqual(self.pragma(wrapper, "journal_mode"), "wal")
+        self.assertEqual(self.pragma(wrapper, "busy_timeout"), settings.SQLITE_PRAGMAS["busy_timeout"])
+        self.assertEqual(self.pragma(wrapper, "synchronous"), 1)  # NORMAL
+        self.assertEqual(self.pragma(wrapper, "query_only"), 0)
+
+    def test_read_only_connections_skip_write_pragmas(self):
+        path = os.path.join(tempfile.mkdtemp(), "db.sqlite3")
+        # A rollback-journal file: switching it to WAL would need a write
+        sqlite3.connect(path).close()
+        wrapper = self.open(f"file:{path}?mode=ro")
+        self.assertEqual(self.pragma(wrapper, "query_only"), 1)
+        self.assertEqual(self.pragma(wrapper, "journal_mode"), "delete")
+        self.assertEqual(self.pragma(wrapper, "busy_timeout"), settings.SQLITE_PRAGMAS["busy_timeout"])
+
+
+# TestCase wraps every test in a transaction, which would pin reads to the primary
+class ReadOnlyRouterTests(TransactionTestCase):
+    router = ReadOnlyCatalogRouter()
+
+    def test_catalog_reads_use_the_replica_outside_transactions(self):
+        self.assertIsNone(self.router.db_for_read(Course))
+        with patch.dict(settings.DATABASES, {READ_ONLY_ALIAS: {"NAME": "file:db.sqlite3?mode=ro"}}):
+            for model in (Course, CourseSearchTerm, Section, Lecture, Review):
+                self.assertEqual(self.router.db_for_read(model), READ_ONLY_ALIAS)
+            self.assertIsNone(self.router.db_for_read(User))
+            self.assertIsNone(self.router.db_for_read(Enrollment))
+            with transaction.atomic():
+                self.assertEqual(self.router.db_for_read(Course), "default")
+            self.assertEqual(self.router.db_for_write(Course), "default")
+            self.assertFalse(self.router.allow_migrate(READ_ONLY_ALIAS, "app"))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class SeedLmsTests(TestCase):
+    def seed(self, **options):
+        call_command(
+            "seed_lms", instructors=2, students=10, courses=5, sections=2, lectures=2,
+            enrollments=2, stdout=StringIO(), **options,
+        )
+        return list(Course.objects.order_by("title").values_list("title", "price", "rating_count"))
+
+    def test_same_seed_same_dataset(self):
+        first = self.seed(seed=7)
+        self.assertEqual(User.objects.filter(role="student").count(), 10)
+        self.assertEqual(Enrollment.objects.count(), Enrollment.objects.values("user", "course").distinct().count())
+        self.assertEqual(self.seed(seed=7, flush=True), first)
+        self.assertNotEqual(self.seed(seed=8, flush=True), first)
+
+    def test_refuses_to_seed_twice(self):
+        self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class CatalogPagingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("seed_lms", instructors=2, students=5, courses=40, enrollments=1, stdout=StringIO())
+        # Put a run of courses on one timestamp so pages must break ties on id
+        tied = Course.objects.order_by("pk").values_list("pk", flat=True)[:15]
+        Course.objects.filter(pk__in=list(tied)).update(created_at=Course.objects.earliest("pk").created_at)
+
+    def crawl(self, url):
+        seen, cursor = [], None
+        while True:
+            response = self.client.get(url + (f"&cursor={cursor}" if cursor else ""))
+            seen += [course.pk for course in response.context["courses"]]
+            cursor = response.context["next_cursor"]
+            if not cursor:
+                return seen
+
+    def test_published_pages_cover_each_course_once(self):
+        seen = self.crawl(reverse("published_courses") + "?")
+        expected = Course.objects.filter(is_published=True).order_by("-created_at", "-id")
+        self.assertEqual(seen, list(expected.values_list("pk", flat=True)))
+
+    def test_search_pages_cover_each_course_once(self):
+        seen = self.crawl(reverse("search_course") + "?level=")
+        self.assertEqual(sorted(seen), sorted(Course.objects.values_list("pk", flat=True)))
+
+    def test_garbled_cursor_starts_over(self):
+        response = self.client.get(reverse("published_courses") + "?cursor=not-a-cursor")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["courses"])
+
+
+class FacetCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create_user(
+            username="instructor", email="instructor@example.com", password="pass",
+            full_name="Instructor", role="instructor",
+        )
+        for title, category, level, price, published in (
+            ("Python Basics", "development", "beginner", 0, True),
+            ("Python Web", "development", "advanced", 1500, True),
+            ("Logo Design", "design", "beginner", 500, False),
+        ):
+            Course.objects.create(
+                title=title, price=price, instructor=instructor, is_published=published,
+                description=title, requirements="None", category=category, level=level,
+            )
+
+    def facets(self, **filters):
+        cache.clear()
+        with self.assertNumQueries(1):
+            return async_to_sync(afacet_counts)(**filters)
+
+    def test_counts_ignore_their_own_filter(self):
+        facets = self.facets(query="python", level="beginner")
+        self.assertEqual(facets["total"], 1)
+        self.assertEqual(dict((key, count) for key, _, count in facets["level"])["advanced"], 1)
+        self.assertEqual(dict((key, count) for key, _, count in facets["category"])["development"], 1)
+        self.assertEqual([count for *_, count in facets["price"]], [1, 0, 0, 0])
+
+    def test_cached_per_normalized_query_until_a_course_changes(self):
+        self.facets(query="python web")
+        with self.assertNumQueries(0):
+            async_to_sync(afacet_counts)(query="Web  PYTHON")
+        Course.objects.get(title="Logo Design").save()
+        with self.assertNumQueries(1):
+            async_to_sync(afacet_counts)(query="python web")
+
+
+class AutocompleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user(
+            username="ada", email="ada@example.com", password="pass",
+            full_name="Ada Lovelace", role="instructor",
+        )
+        cls.courses = {
+            title: Course.objects.create(
+                title=title, price=10, instructor=cls.instructor, is_published=True,
+                description=title, requirements="None", rating_count=count,
+            )
+            for title, count in (("Python Basics", 3), ("Advanced Python", 9), ("Data Science", 1))
+        }
+
+    def setUp(self):
+        reset_index()
+
+    def labels(self, query):
+        return [match["label"] for match in suggest(query)]
+
+    def test_matches_word_prefixes_best_rated_first(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.labels("pyth"), ["Advanced Python", "Python Basics"])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.labels("ADA"), ["Ada Lovelace"])
+            self.assertEqual(self.labels("basics"), ["Python Basics"])
+            self.assertEqual(self.labels("data sc"), ["Data Science"])
+            self.assertEqual(self.labels("science data"), [])
+
+    def test_follows_committed_course_writes(self):
+        self.labels("warm")
+        course = self.courses["Python Basics"]
+        with self.captureOnCommitCallbacks(execute=True):
+            course.title = "Rust Basics"
+            course.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.courses["Data Science"].delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.labels("python"), ["Advanced Python"])
+            self.assertEqual(self.labels("r"), ["Rust Basics"])
+            self.assertEqual(self.labels("data"), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            course.is_published = False
+            course.save()
+        self.assertEqual(self.labels("rust"), [])
+        self.assertEqual(suggest("ada")[0]["score"], 1)
+
+    def test_applies_the_changes_another_process_logged(self):
+        self.labels("warm")
+        # Without a local index the signals only log the changes, as another process would
+        with patch("app.autocomplete._index", None), self.captureOnCommitCallbacks(execute=True):
+            course = self.courses["Python Basics"]
+            course.title = "Rust Basics"
+            course.save()
+            self.instructor.full_name = "Ada King"
+            self.instructor.save()
+        with patch("app.autocomplete._build", side_effect=AssertionError("rebuilt")):
+            with self.assertNumQueries(2):
+                self.assertEqual(self.labels("rust"), ["Rust Basics"])
+            self.assertEqual(self.labels("python"), ["Advanced Python"])
+            self.assertEqual(self.labels("king"), ["Ada King"])
+
+    def test_rebuilds_when_the_change_log_has_a_gap(self):
+        self.labels("warm")
+        # bulk_create skips the signals, and the bare bump below logs nothing
+        Course.objects.bulk_create([Course(
+            title="Python Testing", price=10, instructor=self.instructor, is_published=True,
+            description="Testing", requirements="None",
+        )])
+        self.assertEqual(self.labels("python"), ["Advanced Python", "Python Basics"])
+        cache.incr(AUTOCOMPLETE_VERSION_KEY)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.labels("python"), ["Advanced Python", "Python Basics", "Python Testing"])
+
+    def test_endpoint(self):
+        response = self.client.get(reverse("search_autocomplete"), {"q": "ada", "limit": 5})
+        self.assertEqual(response.json()["results"], [{
+            "type": "instructor", "id": self.instructor.pk, "label": "Ada Lovelace",
+            "url": reverse("search_course") + "?instructor=ada", "thumbnail": None,
+        }])
+
+
+class CurriculumCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user(
+            username="instructor", email="instructor@example.com", password="pass",
+            full_name="Instructor", role="instructor",
+        )
+        cls.course = Course.objects.create(
+            title="Python Basics", price=10, instructor=cls.instructor, is_published=True,
+            description="Learn Python", requirements="None",
+        )
+        cls.section = Section.objects.create(course=cls.course, title="Intro", order=1)
+        cls.lecture = Lecture.objects.create(section=cls.section, title="Welcome", order=1)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.instructor)
+
+    def view_course(self):
+        """Render the course page; return its section/lecture titles and curriculum queries."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("view_course", args=[self.course.pk]))
+        titles = {
+            section["title"]: [lecture["title"] for lecture in section["lectures"]]
+            for section in response.context["curriculum"]["sections"]
+        }
+        return titles, [q["sql"] for q in queries if re.search(r'"app_(section|lecture)"', q["sql"])]
+
+    def assertRendersAfterWrite(self, expected):
+        titles, queries = self.view_course()
+        self.assertEqual(titles, expected)
+        self.assertTrue(queries, "the write did not invalidate the cached curriculum")
+        self.assertEqual(self.view_course(), (expected, []))
+
+    def test_section_and_lecture_writes_refresh_the_course_page(self):
+        self.assertRendersAfterWrite({"Intro": ["Welcome"]})
+
+        response = self.client.post(reverse("create_section", args=[self.course.pk]), {"title": "Basics", "order": 2})
+        section_id = response.json()["section"]["id"]
+        self.assertRendersAfterWrite({"Intro": ["Welcome"], "Basics": []})
+
+        response = self.client.post(reverse("create_lecture", args=[section_id]), {"title": "Variables", "order": 1})
+        self.assertTrue(response.json()["success"])
+        self.assertRendersAfterWrite({"Intro": ["Welcome"], "Basics": ["Variables"]})
+
+        self.client.post(reverse("delete_lecture", args=[self.lecture.pk]))
+        self.assertRendersAfterWrite({"Intro": [], "Basics": ["Variables"]})
+
+        self.client.post(reverse("delete_section", args=[section_id]))
+        self.assertRendersAfterWrite({"Intro": []})
+
+
+class CurriculumBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user(
+            username="instructor", email="instructor@example.com", password="pass",
+            full_name="Instructor", role="instructor",
+        )
+        cls.course = Course.objects.create(
+            title="Python Basics", price=10, instructor=cls.instructor,
+            description="Learn Python", requirements="None",
+        )
+
+    def setUp(self):
+        self.client.force_login(self.instructor)
+
+    def post(self, diff):
+        return self.client.post(
+            reverse("curriculum_batch", args=[self.course.pk]), diff, content_type="application/json"
+        )
+
+    def outline(self):
+        return [
+            (section["title"], [lecture["title"] for lecture in section["lectures"]])
+            for section in get_curriculum(self.course.pk)["sections"]
+        ]
+
+    def test_builds_and_reorders_in_one_request_each(self):
+        response = self.post({
+            "sections": {"create": [{"ref": "intro", "title": "Intro"}, {"ref": "web", "title": "Web"}]},
+            "lectures": {"create": [
+                {"ref": f"l{n}", "section": "intro" if n < 3 else "web", "title": f"L{n}"} for n in range(5)
+            ]},
+        })
+        created = response.json()["created"]
+        orders = dict(Lecture.objects.values_list("pk", "order"))
+
+        response = self.post({
+            "sections": {"update": [{"id": created["sections"]["web"], "title": "Django", "after": None}]},
+            "lectures": {
+                "update": [{"id": created["lectures"]["l4"], "section": created["sections"]["intro"], "after": None}],
+                "delete": [created["lectures"]["l1"]],
+            },
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.outline(), [("Django", ["L3"]), ("Intro", ["L4", "L0", "L2"])])
+        # Only the moved lecture took a new key
+        changed = {pk for pk, order in Lecture.objects.values_list("pk", "order") if orders[pk] != order}
+        self.assertEqual(changed, {created["lectures"]["l4"]})
+
+    def test_invalid_diff_writes_nothing(self):
+        section = Section.objects.create(course=self.course, title="Intro", order=1)
+        response = self.post({
+            "sections": {"delete": [section.pk]},
+            "lectures": {"create": [{"ref": "a", "section": section.pk, "title": "A"}]},
+        })
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(Section.objects.filter(pk=section.pk).exists())
+
+        for diff in (
+            {"sections": [1]},
+            {"sections": {"delete": [section.pk]}, "lectures": {"delete": [[1]]}},
+            {"sections": {"delete": [section.pk]}, "lectures": {"delete": "ab"}},
+            {"sections": {"delete": [section.pk], "rename": []}},
+            {"sections": {"delete": [section.pk], "update": [1]}},
+            {"sections": {"delete": [section.pk]}, "lectures": {"create": [{"ref": "a", "section": [1], "title": "A"}]}},
+            {"sections": {"delete": [True]}},
+        ):
+            with self.subTest(diff=diff):
+                self.assertEqual(self.post(diff).status_code, 400)
+                self.assertTrue(Section.objects.filter(pk=section.pk).exists())
+
+    def test_only_the_instructor(self):
+        other = User.objects.create_user(
+            username="other", email="other@example.com", password="pass", full_name="Other", role="instructor",
+        )
+        self.client.force_login(other)
+        self.assertEqual(self.post({}).status_code, 403)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class CoursePurgeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("seed_lms", instructors=1, students=6, courses=2, enrollments=2, published_rate=1, stdout=StringIO())
+        cls.course, cls.other = Course.objects.order_by("pk")
+        section = cls.course.sections.first()
+        for n in range(3):
+            Lecture.objects.create(
+                section=section, title=f"Video {n}", order=100 + n,
+                video=ContentFile(b"video", name=f"video{n}.mp4"),
+            )
+
+    def test_soft_delete_hides_then_purge_removes_rows_and_orphaned_files(self):
+        self.client.force_login(self.course.instructor)
+        response = self.client.post(reverse("delete_courses", args=[self.course.pk]))
+        self.assertRedirects(response, reverse("list_courses"), fetch_redirect_response=False)
+        self.assertFalse(Course.objects.filter(pk=self.course.pk).exists())
+        self.assertEqual(self.client.get(reverse("view_course", args=[self.course.pk])).status_code, 404)
+        self.assertFalse(self.course.search_terms.exists())
+
+        videos = [video for video in Lecture.objects.filter(section__course=self.course).values_list("video", flat=True) if video]
+        thumbnail = self.course.thumbnail_img.name
+        job = Job.objects.get(task="app.purge.purge_course")
+        with patch("app.purge.PURGE_BATCH_SIZE", 2), patch("app.purge.PURGE_BATCH_PAUSE", 0):
+            self.assertTrue(run_job(job.pk))
+
+        self.assertFalse(Course.all_objects.filter(pk=self.course.pk).exists())
+        self.assertFalse(Lecture.objects.filter(section__course_id=self.course.pk).exists())
+        self.assertFalse(Enrollment.objects.filter(course_id=self.course.pk).exists())
+        self.assertFalse(any(default_storage.exists(name) for name in videos))
+        # Seeded courses share placeholder thumbnails; a file still in use stays
+        self.assertEqual(default_storage.exists(thumbnail), self.other.thumbnail_img.name == thumbnail)
+        self.assertTrue(Enrollment.objects.filter(course=self.other).exists())
+
+
+class PaymentCallbackTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create_user(
+            username="instructor", email="instructor@example.com", password="pass",
+            full_name="Instructor", role="instructor",
+        )
+        cls.student = User.objects.create_user(
+            username="student", email="student@example.com", password="pass", full_name="Student",
+        )
+        cls.course = Course.objects.create(
+            title="Python Basics", price=1500, instructor=instructor, is_published=True,
+            description="Learn Python", requirements="None", offer_certificate=True,
+        )
+
+    def setUp(self):
+        self.client.force_login(self.student)
+
+    def start(self):
+        response = self.client.get(reverse("process_payment", args=[self.course.pk]))
+        return response.context["transaction_uuid"]
+
+    def callback(self, transaction_uuid, amount="1500.00", signature=None):
+        payload = {
+            "transaction_code": "000AB12", "status": "COMPLETE", "total_amount": amount,
+            "transaction_uuid": transaction_uuid, "product_code": ESEWA_PRODUCT_CODE,
+            "signed_field_names": "transaction_code,status,total_amount,transaction_uuid,product_code,signed_field_names",
+        }
+        payload["signature"] = signature or sign(payload["signed_field_names"].split(","), payload)
+        data = base64.b64encode(json.dumps(payload).encode()).decode()
+        return self.client.get(reverse("payment_success", args=[self.course.pk]), {"data": data})
+
+    def assertRejected(self, response):
+        self.assertRedirects(
+            response, reverse("payment_failure", args=[self.course.pk]), fetch_redirect_response=False
+        )
+        self.assertFalse(Enrollment.objects.filter(course=self.course).exists())
+
+    def test_completes_the_pending_payment_once(self):
+        transaction_uuid = self.start()
+        self.assertEqual(self.callback(transaction_uuid).status_code, 200)
+        payment = Payment.objects.get(transaction_uuid=transaction_uuid)
+        self.assertEqual((payment.status, payment.transaction_code), ("complete", "000AB12"))
+        self.assertTrue(Certificate.objects.filter(enrollment__user=self.student).exists())
+
+        # A reload is answered from the completed payment without enrollment writes
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            self.assertEqual(self.callback(transaction_uuid).status_code, 200)
+        self.assertFalse([sql for sql in recorder.queries if "app_enrollment" in sql or "app_certificate" in sql])
+        self.assertEqual(Enrollment.objects.filter(course=self.course).count(), 1)
+
+    def test_rejects_another_users_transaction(self):
+        transaction_uuid = self.start()
+        other = User.objects.create_user(username="other", email="other@example.com", password="pass", full_name="Other")
+        self.client.force_login(other)
+        self.assertRejected(self.callback(transaction_uuid))
+        self.assertEqual(Payment.objects.get(transaction_uuid=transaction_uuid).status, "pending")
+
+    def test_rejects_a_different_amount(self):
+        transaction_uuid = self.start()
+        self.assertRejected(self.callback(transaction_uuid, amount="1.00"))
+        self.assertEqual(Payment.objects.get(transaction_uuid=transaction_uuid).status, "pending")
+
+    def test_rejects_a_forged_signature(self):
+        transaction_uuid = self.start()
+        self.assertRejected(self.callback(transaction_uuid, signature=base64.b64encode(b"forged").decode()))
+
+    def test_never_creates_a_payment_from_a_callback(self):
+        # Correctly signed, but for a transaction process_payment never started
+        self.assertRejected(self.callback(f"{self.course.pk}-{self.student.pk}-1"))
+        self.assertFalse(Payment.objects.exists())
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), CHUNKED_UPLOAD_DIR=tempfile.mkdtemp())
+class ChunkedUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user(
+            username="instructor", email="instructor@example.com", password="pass",
+            full_name="Instructor", role="instructor",
+        )
+        course = Course.objects.create(
+            title="Python Basics", price=0, instructor=cls.instructor,
+            description="Learn Python", requirements="None",
+        )
+        cls.section = Section.objects.create(course=course, title="Intro", order=1)
+
+    def setUp(self):
+        self.client.force_login(self.instructor)
+
+    def start(self, data):
+        response = self.client.post(reverse("upload_init"), {
+            "filename": "video.mp4", "size": len(data), "checksum": hashlib.sha256(data).hexdigest(),
+        })
+        return ChunkedUpload.objects.get(pk=response.json()["upload_id"])
+
+    def send(self, upload, offset, chunk, checksum=None):
+        return self.client.post(
+            f"{reverse('upload_chunk', args=[upload.pk])}?offset={offset}", chunk,
+            content_type="application/octet-stream",
+            headers={"X-Chunk-Checksum": checksum or hashlib.sha256(chunk).hexdigest()},
+        )
+
+    def create_lecture(self, upload):
+        return self.client.post(reverse("create_lecture", args=[self.section.pk]), {
+            "title": "Welcome", "order": 1, "video_upload_id": upload.pk,
+        })
+
+    def test_rejects_wrong_offsets_and_checksums_without_writing(self):
+        upload = self.start(b"0123456789")
+        self.assertEqual(self.send(upload, 0, b"012345").json()["received"], 6)
+
+        for offset, chunk, checksum in ((0, b"012345", None), (8, b"89", None), (6, b"6789", "0" * 64)):
+            response = self.send(upload, offset, chunk, checksum)
+            self.assertEqual(response.status_code, 409 if checksum is None else 400)
+            self.assertEqual(response.json()["received"], 6)
+        with open(part_path(upload), "rb") as part:
+            self.assertEqual(part.read(), b"012345")
+
+        self.assertEqual(self.send(upload, 6, b"6789").json()["received"], 10)
+        self.assertEqual(self.client.post(reverse("upload_finalize", args=[upload.pk])).json()["status"], "complete")
+
+    def test_partials_stay_out_of_media_until_attached_once(self):
+        upload = self.start(b"0123456789")
+        self.send(upload, 0, b"0123456789")
+        self.client.post(reverse("upload_finalize", args=[upload.pk]))
+        self.assertFalse(os.path.abspath(part_path(upload)).startswith(os.path.abspath(settings.MEDIA_ROOT)))
+
+        self.assertTrue(self.create_lecture(upload).json()["success"])
+        lecture = Lecture.objects.get(section=self.section)
+        with lecture.video.open("rb") as video:
+            self.assertEqual(video.read(), b"0123456789")
+        self.assertFalse(os.path.exists(part_path(upload)))
+        self.assertFalse(self.create_lecture(upload).json()["success"])
+        self.assertEqual(Lecture.objects.filter(section=self.section).count(), 1)
+
+    def test_failed_attach_rolls_back_the_lecture(self):
+        upload = self.start(b"0123456789")
+        self.send(upload, 0, b"0123456789")
+        self.client.post(reverse("upload_finalize", args=[upload.pk]))
+
+        with patch("app.uploads._PartFile.temporary_file_path", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.create_lecture(upload)
+        self.assertFalse(Lecture.objects.filter(section=self.section).exists())
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, "complete")
+        self.assertTrue(self.create_lecture(upload).json()["success"])
+
+    def test_clean_uploads_deletes_abandoned_uploads_and_their_partials(self):
+        stale, fresh = self.start(b"0123456789"), self.start(b"0123456789")
+        self.send(stale, 0, b"01234")
+        self.send(fresh, 0, b"01234")
+        expired = timezone.now() - timedelta(seconds=settings.CHUNKED_UPLOAD_EXPIRY + 60)
+        ChunkedUpload.objects.filter(pk=stale.pk).update(updated_at=expired)
+        os.utime(part_path(stale), (expired.timestamp(), expired.timestamp()))
+
+        call_command("clean_uploads", stdout=StringIO())
+        self.assertEqual(list(ChunkedUpload.objects.values_list("pk", flat=True)), [fresh.pk])
+        self.assertFalse(os.path.exists(part_path(stale)))
+        self.assertTrue(os.path.exists(part_path(fresh)))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ImageDerivativeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user(
+            username="instructor", email="instructor@example.com", password="pass",
+            full_name="Instructor", role="instructor",
+        )
+
+    def image(self, name):
+        buffer = BytesIO()
+        Image.new("RGB", (1200, 800), "teal").save(buffer, "JPEG")
+        return ContentFile(buffer.getvalue(), name=name)
+
+    def test_queues_a_job_only_when_the_image_changes(self):
+        course = Course.objects.create(
+            title="Python Basics", price=0, instructor=self.instructor, description="Learn Python",
+            requirements="None", thumbnail_img=self.image("cover.jpg"),
+        )
+        job = Job.objects.get(task="app.images.generate_derivatives")
+        self.assertEqual(job.payload, {"name": course.thumbnail_img.name})
+
+        course.title = "Python Basics II"
+        course.save()
+        Course.objects.get(pk=course.pk).save()
+        self.assertEqual(Job.objects.count(), 1)
+
+        self.assertTrue(run_job(job.pk))
+        self.assertTrue(derivatives_ready(course.thumbnail_img.name))
+
+        course.thumbnail_img = self.image("cover2.jpg")
+        course.save()
+        self.assertEqual(
+            list(Job.objects.order_by("pk").values_list("payload", flat=True))[-1],
+            {"name": course.thumbnail_img.name},
+        )
+
+
+class JobQueueTests(TestCase):
+    def test_claim_takes_each_due_job_once(self):
+        due = Job.objects.create(task="app.tests.noop")
+        Job.objects.create(task="app.tests.noop", run_after=timezone.now() + timedelta(hours=1))
+        self.assertEqual(claim(10), [due.pk])
+        self.assertEqual(claim(10), [])
+        due.refresh_from_db()
+        self.assertEqual((due.status, due.attempts), ("running", 1))
+
+    def test_requeue_stale_returns_abandoned_jobs_to_the_queue(self):
+        stale = Job.objects.create(task="app.tests.noop", status="running")
+        fresh = Job.objects.create(task="app.tests.noop", status="running")
+        Job.objects.filter(pk=stale.pk).update(updated_at=timezone.now() - STALE_AFTER * 2)
+        self.assertEqual(requeue_stale(), 1)
+        self.assertEqual(claim(10), [stale.pk])
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.status, "running")
+
+    def test_failed_job_retries_with_backoff_then_gives_up(self):
+        job = Job.objects.create(task="app.tests.fail")
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+            self.assertEqual(claim(1), [job.pk])
+            with self.assertLogs("app.jobs", "ERROR"):
+                self.assertFalse(run_job(job.pk))
+            job.refresh_from_db()
+            self.assertIn("boom", job.error)
+            self.assertEqual(job.status, "queued" if attempt < MAX_ATTEMPTS else "failed")
+
+    def test_worker_crash_fails_the_job_without_stopping_the_loop(self):
+        crashed = Job.objects.create(task="app.tests.noop")
+        with patch("app.management.commands.run_jobs.ProcessPoolExecutor", ThreadPoolExecutor), \
+                patch("app.management.commands.run_jobs._run", side_effect=RuntimeError("worker died")), \
+                self.assertLogs("app.management.commands.run_jobs", "ERROR"):
+            call_command("run_jobs", once=True, processes=1, stdout=StringIO())
+        crashed.refresh_from_db()
+        self.assertEqual(crashed.status, "failed")
+        self.assertIn("worker died", crashed.error)
+
+
+class IssueCertificatesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create_user(
+            username="instructor", email="instructor@example.com", password="pass",
+            full_name="Instructor", role="instructor",
+        )
+        cls.course, no_certificate, deleted = [
+            Course.objects.create(
+                title=f"Course {n}", price=10, instructor=instructor, offer_certificate=n != 1,
+                description="Learn things", requirements="None",
+            )
+            for n in range(3)
+        ]
+        Course.all_objects.filter(pk=deleted.pk).update(deleted_at=timezone.now())
+        students = User.objects.bulk_create(
+            User(username=f"student{n}", email=f"student{n}@example.com", full_name=f"Student {n}")
+            for n in range(6)
+        )
+        cls.enrollments = Enrollment.objects.bulk_create(
+            Enrollment(user=student, course=cls.course) for student in students
+        )
+        cls.skipped = Enrollment.objects.bulk_create(
+            [Enrollment(user=students[0], course=no_certificate), Enrollment(user=students[0], course=deleted)]
+        )
+        Certificate.objects.create(enrollment=cls.enrollments[0])
+        Job.objects.all().delete()
+
+    def test_issues_missing_certificates_in_batches_and_queues_their_pdfs(self):
+        raced = self.enrollments[2]
+        bulk_create = Certificate.objects.bulk_create
+
+        def racing_bulk_create(objs, **kwargs):
+            # payment_success issues one of the batch's certificates first
+            if not Certificate.objects.filter(enrollment=raced).exists():
+                Certificate.objects.create(enrollment=raced)
+            return bulk_create(objs, **kwargs)
+
+        out = StringIO()
+        with patch.object(Certificate.objects, "bulk_create", side_effect=racing_bulk_create):
+            call_command("issue_certificates", batch_size=2, defer_pdf=True, stdout=out)
+
+        # Five pending enrollments in batches of two, one of them taken by the race
+        self.assertEqual(out.getvalue().count("  issued "), 3)
+        self.assertIn("Issued 4 certificates", out.getvalue())
+        self.assertEqual(
+            set(Certificate.objects.values_list("enrollment_id", flat=True)), {e.pk for e in self.enrollments}
+        )
+        self.assertFalse(Certificate.objects.filter(enrollment__in=self.skipped).exists())
+        # Every certificate but the first has exactly one render job, the raced one's from its signal
+        queued = sorted(
+            job.payload["certificate_id"] for job in Job.objects.filter(task="app.certificates.render_certificate_pdf")
+        )
+        self.assertEqual(
+            queued, sorted(Certificate.objects.exclude(enrollment=self.enrollments[0]).values_list("pk", flat=True))
+        )
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class CertificatePdfTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create_user(
+            username="instructor", email="instructor@example.com", password="pass",
+            full_name="Instructor", role="instructor",
+        )
+        cls.course = Course.objects.create(
+            title="Python Basics", price=10, instructor=instructor, offer_certificate=True,
+            description="Learn Python", requirements="None",
+        )
+        cls.student = User.objects.create_user(
+            username="student", email="student@example.com", password="pass", full_name="Student",
+        )
+        cls.enrollment = Enrollment.objects.create(user=cls.student, course=cls.course)
+
+    def test_queued_pdf_is_rendered_then_served(self):
+        certificate = Certificate.objects.create(enrollment=self.enrollment)
+        url = reverse("view_certificate", args=[self.course.pk])
+        self.client.force_login(self.student)
+        self.assertTemplateUsed(self.client.get(url), "course/certificate.html")
+
+        job = Job.objects.get(task="app.certificates.render_certificate_pdf")
+        self.assertEqual(job.payload, {"certificate_id": certificate.pk})
+        self.assertEqual(claim(10), [job.pk])
+        self.assertTrue(run_job(job.pk))
+        certificate.refresh_from_db()
+        self.assertTrue(certificate.pdf_file)
+
+        response = self.client.get(url)
+        self.assertIsInstance(response, FileResponse)
+        self.assertIn(f"certificate-{certificate.certificate_id}.pdf", response["Content-Disposition"])
+        self.assertTrue(b"".join(response.streaming_content).startswith(b"%PDF"))
+        response.close()
+        self.assertTemplateUsed(self.client.get(url, {"format": "html"}), "course/certificate.html")
+
+
+def noop():
+    pass
+
+
+def fail():
+    raise ValueError("boom")
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class CourseCardCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user(
+            username="instructor", email="instructor@example.com", password="pass",
+            full_name="Instructor", role="instructor",
+        )
+        buffer = BytesIO()
+        Image.new("RGB", (1200, 800), "teal").save(buffer, "JPEG")
+        cls.course = Course.objects.create(
+            title="Python Basics", price=0, instructor=cls.instructor, is_published=True,
+            description="Learn Python", requirements="None",
+            thumbnail_img=ContentFile(buffer.getvalue(), name="cover.jpg"),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.instructor)
+
+    def card(self):
+        return self.client.get(reverse("published_courses")).content.decode()
+
+    def test_card_is_cached_until_the_course_or_its_derivatives_change(self):
+        self.assertNotIn("<picture>", self.card())
+
+        # Writes that bypass save() leave the cached card in place
+        Course.objects.filter(pk=self.course.pk).update(title="Renamed")
+        self.assertIn("Python Basics", self.card())
+
+        self.assertTrue(run_job(Job.objects.get(task="app.images.generate_derivatives").pk))
+        html = self.card()
+        self.assertIn("<picture>", html)
+        self.assertIn("Renamed", html)
+
+    def test_search_card_follows_an_instructor_rename(self):
+        def search_card():
+            return self.client.get(reverse("search_course"), {"q": "python"}).content.decode()
+
+        self.assertIn("<strong>Instructor:</strong> instructor<", search_card())
+        self.instructor.username = "teacher"
+        self.instructor.save(update_fields=["username"])
+        self.assertIn("<strong>Instructor:</strong> teacher<", search_card())
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user(
+            username="instructor", email="instructor@example.com", password="pass",
+            full_name="Instructor", role="instructor",
+        )
+        cls.course = Course.objects.create(
+            title="Python Basics", price=0, instructor=cls.instructor, is_published=True,
+            description="Learn Python", requirements="None",
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_current_copy_gets_a_304(self):
+        url = reverse("view_course", args=[self.course.pk])
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, headers={"If-None-Match": etag}).status_code, 304)
+        self.assertEqual(self.client.get(url, headers={"If-None-Match": '"stale"'}).status_code, 200)
+
+    def test_unused_query_parameters_share_the_cached_page(self):
+        url = reverse("view_course", args=[self.course.pk])
+        self.client.get(url, {"utm_source": "a"})
+        with self.assertNumQueries(1):  # the validators only
+            response = self.client.get(url, {"utm_source": "b"})
+        self.assertContains(response, "Python Basics")
+
+        # The catalog reads ?cursor=, so that one still gets its own entry
+        self.client.get(reverse("published_courses"))
+        with self.assertNumQueries(2):
+            self.client.get(reverse("published_courses"), {"cursor": ""})
+
+    def test_instructor_rename_moves_the_etag(self):
+        url = reverse("view_course", args=[self.course.pk])
+        etag = self.client.get(url)["ETag"]
+        User.objects.filter(pk=self.instructor.pk).update(full_name="Renamed Instructor")
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Renamed Instructor")
+
+
+class SearchIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor = User.objects.create_user(
+            username="guido", email="guido@example.com", password="pass",
+            full_name="Guido", role="instructor",
+        )
+
+        def course(title, description, **fields):
+            return Course.objects.create(
+                title=title, description=description, price=10, instructor=cls.instructor,
+                requirements="None", **fields,
+            )
+
+        cls.titled = course("Python Basics", "Start here")
+        cls.described = course("Scripting", "Automate chores with python", category="business")
+        cls.other = course("Watercolour", "Brushes and paper", level="advanced")
+
+    def ids(self, query, **filters):
+        return [row["course_id"] for row in ranked_course_ids(query, **filters)]
+
+    def test_ranks_title_hits_above_description_hits(self):
+        self.assertEqual(self.ids("pyth"), [self.titled.pk, self.described.pk])
+        self.assertEqual(self.ids("python automate"), [self.described.pk])
+        self.assertEqual(self.ids("python", category="business"), [self.described.pk])
+        # Every course is by guido, so the instructor's name alone matches all three
+        self.assertEqual(len(self.ids("guido")), 3)
+        self.assertEqual(self.ids(""), [])
+
+    def test_follows_edits_and_rebuilds(self):
+        self.other.title = "Python Painting"
+        self.other.save()
+        self.assertIn(self.other.pk, self.ids("painting"))
+        self.assertNotIn(self.other.pk, self.ids("watercolour"))
+
+        CourseSearchTerm.objects.all().delete()
+        self.assertEqual(self.ids("python"), [])
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(self.ids("python"), [self.other.pk, self.titled.pk, self.described.pk])
+
+
+class RatingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create_user(
+            username="instructor", email="instructor@example.com", password="pass",
+            full_name="Instructor", role="instructor",
+        )
+        cls.course = Course.objects.create(
+            title="Python Basics", price=10, instructor=instructor, description="Learn Python", requirements="None",
+        )
+        cls.students = [
+            User.objects.create_user(
+                username=f"student{n}", email=f"student{n}@example.com", password="pass", full_name=f"Student {n}",
+            )
+            for n in range(2)
+        ]
+        for student in cls.students:
+            Enrollment.objects.create(user=student, course=cls.course)
+
+    def ratings(self):
+        return Course.objects.values(*Course.RATING_FIELDS).get(pk=self.course.pk)
+
+    def test_review_writes_fold_into_the_rating_columns(self):
+        first, second = self.students
+        self.client.force_login(first)
+        self.client.post(reverse("review_create", args=[self.course.pk]), {"rating": 5})
+        self.client.force_login(second)
+        self.client.post(reverse("review_create", args=[self.course.pk]), {"rating": 2})
+        review = Review.objects.get(user=second)
+        self.client.post(reverse("review_update", args=[review.pk]), {"rating": 4})
+        self.assertEqual(self.ratings(), {
+            "rating_avg": 4.5, "rating_count": 2, "rating_sum": 9,
+            "rating_1": 0, "rating_2": 0, "rating_3": 0, "rating_4": 1, "rating_5": 1,
+        })
+
+        self.client.post(reverse("review_delete", args=[review.pk]))
+        self.assertEqual(self.ratings()["rating_avg"], 5.0)
+        self.assertEqual((self.ratings()["rating_count"], self.ratings()["rating_4"]), (1, 0))
+
+    def test_stale_instance_save_keeps_newer_ratings(self):
+        stale = Course.objects.get(pk=self.course.pk)
+        apply_rating_change(self.course.pk, new=3)
+        stale.title = "Python Basics II"
+        stale.save()
+        self.assertEqual(self.ratings()["rating_count"], 1)
+        self.assertEqual(self.ratings()["rating_3"], 1)
+
+    def test_rebuild_matches_the_reviews_table(self):
+        for student, rating in zip(self.students, (1, 4)):
+            Review.objects.create(course=self.course, user=student, rating=rating, comment="")
+        Course.objects.filter(pk=self.course.pk).update(rating_count=7, rating_sum=1, rating_avg=0)
+        call_command("rebuild_ratings", stdout=StringIO())
+        ratings = self.ratings()
+        self.assertEqual((ratings["rating_count"], ratings["rating_sum"], ratings["rating_avg"]), (2, 5, 2.5))
+        self.assertEqual((ratings["rating_1"], ratings["rating_4"]), (1, 1))
+
+
+class ReviewPagingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create_user(
+            username="instructor", email="instructor@example.com", password="pass",
+            full_name="Instructor", role="instructor",
+        )
+        cls.course = Course.objects.create(
+            title="Python Basics", price=10, instructor=instructor, description="Learn Python", requirements="None",
+        )
+        reviewers = User.objects.bulk_create(
+            User(username=f"reviewer{n}", email=f"reviewer{n}@example.com", full_name=f"Reviewer {n}")
+            for n in range(25)
+        )
+        Review.objects.bulk_create(
+            Review(course=cls.course, user=user, rating=n % 5 + 1, comment=f"Review {n}")
+            for n, user in enumerate(reviewers)
+        )
+        # Put a run of reviews on one timestamp so pages must break ties on id
+        tied = list(Review.objects.order_by("pk").values_list("pk", flat=True)[5:15])
+        Review.objects.filter(pk__in=tied).update(created_at=Review.objects.earliest("pk").created_at)
+
+    def test_cursor_pages_cover_each_review_once(self):
+        url = reverse("review_list", args=[self.course.pk])
+        seen, cursor = [], None
+        while True:
+            response = self.client.get(url, {"page_size": 7, **({"cursor": cursor} if cursor else {})}).json()
+            self.assertLessEqual(len(response["reviews"]), 7)
+            seen += [review["id"] for review in response["reviews"]]
+            cursor = response["next_cursor"]
+            if not cursor:
+                break
+        expected = self.course.reviews.order_by("-created_at", "-id").values_list("pk", flat=True)
+        self.assertEqual(seen, list(expected))
+
+    def test_garbled_cursor_is_rejected(self):
+        response = self.client.get(reverse("review_list", args=[self.course.pk]), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_ndjson_streams_every_review(self):
+        response = await self.async_client.get(reverse("review_list", args=[self.course.pk]), {"format": "ndjson"})
+        lines = b"".join([chunk async for chunk in response.streaming_content]).decode().splitlines()
+        self.assertEqual(len(lines), 25)
+        self.assertEqual(set(json.loads(lines[0])), {"id", "user__full_name", "rating", "comment", "created_at"})
+
+    def test_ndjson_streams_under_wsgi(self):
+        # An async iterator under WSGI is buffered whole, with a warning
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            response = self.client.get(reverse("review_list", args=[self.course.pk]), {"format": "ndjson"})
+            self.assertFalse(response.is_async)
+            lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 25)
+        self.assertEqual(len({json.loads(line)["id"] for line in lines}), 25)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class MediaServingTests(TestCase):
+    def setUp(self):
+        os.makedirs(os.path.join(settings.MEDIA_ROOT, "docs"), exist_ok=True)
+        with open(os.path.join(settings.MEDIA_ROOT, "docs", "file.txt"), "wb") as f:
+            f.write(b"0123456789")
+        self.url = reverse("serve_media", args=["docs/file.txt"])
+
+    def get(self, **headers):
+        response = self.client.get(self.url, headers=headers)
+        body = b"".join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_byte_ranges(self):
+        response, body = self.get()
+        self.assertEqual((response.status_code, body, response["Accept-Ranges"]), (200, b"0123456789", "bytes"))
+
+        for header, content_range, expected in (
+            ("bytes=2-5", "bytes 2-5/10", b"2345"),
+            ("bytes=-3", "bytes 7-9/10", b"789"),
+            ("bytes=8-", "bytes 8-9/10", b"89"),
+            ("bytes=8-100", "bytes 8-9/10", b"89"),
+        ):
+            with self.subTest(range=header):
+                response, body = self.get(Range=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual((response["Content-Range"], response["Content-Length"]), (content_range, str(len(expected))))
+                self.assertEqual(body, expected)
+
+        # Malformed or multi-range headers fall back to the whole file
+        for header in ("bytes=5-2", "bytes=0-1,4-5", "items=0-1"):
+            with self.subTest(range=header):
+                self.assertEqual(self.get(Range=header)[1], b"0123456789")
+
+        response, _ = self.get(Range="bytes=10-")
+        self.assertEqual((response.status_code, response["Content-Range"]), (416, "bytes */10"))
+
+    def test_validators(self):
+        response, _ = self.get()
+        etag = response["ETag"]
+        self.assertEqual(self.get(**{"If-None-Match": etag})[0].status_code, 304)
+        self.assertEqual(self.get(**{"If-Modified-Since": response["Last-Modified"]})[0].status_code, 304)
+        # If-Range only honours the Range while the client's copy is current
+        self.assertEqual(self.get(Range="bytes=0-1", **{"If-Range": etag})[1], b"01")
+        self.assertEqual(self.get(Range="bytes=0-1", **{"If-Range": '"stale"'})[1], b"0123456789")
+
+    def test_stays_inside_media_root(self):
+        # safe_join rejects traversal as a suspicious operation
+        self.assertEqual(self.client.get(reverse("serve_media", args=["../settings.py"])).status_code, 400)
+        for path in ("docs", "docs/missing.txt"):
+            with self.subTest(path=path):
+                self.assertEqual(self.client.get(reverse("serve_media", args=[path])).status_code, 404)
+
+
+class EntitlementTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create_user(
+            username="instructor", email="instructor@example.com", password="pass",
+            full_name="Instructor", role="instructor",
+        )
+        cls.student = User.objects.create_user(
+            username="student", email="student@example.com", password="pass", full_name="Student",
+        )
+        cls.courses = [
+            Course.objects.create(
+                title=f"Course {n}", price=10, instructor=instructor, is_published=True,
+                description="Learn things", requirements="None",
+            )
+            for n in range(2)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_until_an_enrollment_changes(self):
+        first, second = self.courses
+        Enrollment.objects.create(user=self.student, course=first)
+        self.assertEqual(enrolled_course_ids(self.student), {first.pk})
+        with self.assertNumQueries(0):
+            self.assertTrue(is_enrolled(self.student, first.pk))
+            self.assertFalse(is_enrolled(self.student, second.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            enrollment = Enrollment.objects.create(user=self.student, course=second)
+            # Still cached until the enrollment commits
+            self.assertFalse(is_enrolled(self.student, second.pk))
+        self.assertTrue(is_enrolled(self.student, second.pk))
+        self.assertTrue(async_to_sync(ais_enrolled)(self.student, second.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            enrollment.delete()
+        self.assertFalse(is_enrolled(self.student, second.pk))
+        self.assertFalse(async_to_sync(ais_enrolled)(self.student, second.pk))
+
+    def test_other_users_and_visitors_are_unaffected(self):
+        other = User.objects.create_user(username="other", email="other@example.com", password="pass", full_name="O")
+        self.assertEqual(enrolled_course_ids(other), frozenset())
+        Enrollment.objects.create(user=self.student, course=self.courses[0])
+        with self.assertNumQueries(0):
+            self.assertEqual(enrolled_course_ids(other), frozenset())
+            self.assertEqual(enrolled_course_ids(AnonymousUser()), frozenset())
+
+
+class InstructorDashboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.instructor, other = (
+            User.objects.create_user(
+                username=name, email=f"{name}@example.com", password="pass", full_name=name, role="instructor",
+            )
+            for name in ("instructor", "other")
+        )
+        students = User.objects.bulk_create(
+            User(username=f"student{n}", email=f"student{n}@example.com", full_name=f"Student {n}") for n in range(3)
+        )
+        cls.courses = [
+            Course.objects.create(
+                title=f"Course {n}", price=price, instructor=cls.instructor, is_published=published,
+                description="Learn things", requirements="None", rating_count=count, rating_sum=total,
+            )
+            for n, (price, published, count, total) in enumerate(
+                ((100, True, 2, 9), (50, True, 1, 3), (0, False, 0, 0), *[(10, False, 0, 0)] * 4)
+            )
+        ]
+        Course.objects.create(
+            title="Not mine", price=999, instructor=other, is_published=True,
+            description="Learn things", requirements="None", rating_count=5, rating_sum=5,
+        )
+        Enrollment.objects.bulk_create(
+            [Enrollment(user=student, course=cls.courses[0]) for student in students]
+            + [Enrollment(user=students[0], course=cls.courses[1])]
+        )
+
+    def test_aggregates_only_the_instructors_courses(self):
+        self.client.force_login(self.instructor)
+        response = self.client.get(reverse("instructor_dashboard"))
+        context = response.context
+        self.assertEqual(
+            (context["total_count"], context["published_count"], context["draft_count"]), (7, 2, 5)
+        )
+        self.assertEqual(context["total_students"], 4)
+        self.assertEqual(context["total_revenue"], Decimal("350"))
+        self.assertEqual(context["avg_rating"], 4.0)  # (9 + 3) / (2 + 1)
+        self.assertEqual(
+            [course.pk for course in context["recent_courses"]],
+            [course.pk for course in reversed(self.courses)][:5],
+        )
+
+    def test_new_instructor_sees_zeroes(self):
+        newcomer = User.objects.create_user(
+            username="new", email="new@example.com", password="pass", full_name="New", role="instructor",
+        )
+        self.client.force_login(newcomer)
+        context = self.client.get(reverse("instructor_dashboard")).context
+        self.assertEqual((context["total_count"], context["total_students"], context["avg_rating"]), (0, 0, 0))
+        self.assertEqual(context["total_revenue"], Decimal("0"))
+
+
+class StudentStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        instructor = User.objects.create_user(
+            username="instructor", email="instructor@example.com", password="pass",
+            full_name="Instructor", role="instructor",
+        )
+        cls.student = User.objects.create_user(
+            username="student", email="student@example.com", password="pass", full_name="Student",
+        )
+        cls.courses = [
+            Course.objects.create(
+                title=f"Course {n}", price=10, instructor=instructor, is_published=True,
+                description="Learn things", requirements="None",
+            )
+            for n in range(2)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def stats(self):
+        return student_stats(self.student)
+
+    def test_counts_are_cached_until_the_student_changes_them(self):
+        first, second = self.courses
+        with self.captureOnCommitCallbacks(execute=True):
+            enrollment = Enrollment.objects.create(user=self.student, course=first)
+        self.assertEqual(self.stats(), {"total_enrolled": 1, "certificates_count": 0, "reviews_count": 0})
+        with self.assertNumQueries(0):
+            self.stats()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            certificate = Certificate.objects.create(enrollment=enrollment)
+        self.assertEqual(self.stats()["certificates_count"], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            review = Review.objects.create(course=first, user=self.student, rating=5, comment="")
+        self.assertEqual(self.stats()["reviews_count"], 1)
+
+        # Editing a review changes no count, so the cached stats survive it
+        self.stats()
+        with self.captureOnCommitCallbacks(execute=True):
+            review.comment = "Great"
+            review.save()
+        with self.assertNumQueries(0):
+            self.stats()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.create(user=self.student, course=second)
+            # Still cached until the enrollment commits
+            self.assertEqual(self.stats()["total_enrolled"], 1)
+        self.assertEqual(self.stats()["total_enrolled"], 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            certificate.delete()
+            review.delete()
+        self.assertEqual(self.stats(), {"total_enrolled": 2, "certificates_count": 0, "reviews_count": 0})
+
+    def test_soft_deleted_courses_stop_counting(self):
+        first, second = self.courses
+        with self.captureOnCommitCallbacks(execute=True):
+            enrollment = Enrollment.objects.create(user=self.student, course=first)
+            Enrollment.objects.create(user=self.student, course=second)
+            Certificate.objects.create(enrollment=enrollment)
+            Review.objects.create(course=first, user=self.student, rating=5, comment="")
+        self.assertEqual(self.stats(), {"total_enrolled": 2, "certificates_count": 1, "reviews_count": 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            soft_delete_course(first)
+        self.assertEqual(self.stats(), {"total_enrolled": 1, "certificates_count": 0, "reviews_count": 0})
+
+    def test_dashboard_shows_the_stats(self):
+        Enrollment.objects.create(user=self.student, course=self.courses[0])
+        self.client.force_login(self.student)
+        response = self.client.get(reverse("student_dashboard"))
+        self.assertEqual((response.context["total_enrolled"], response.context["completed_count"]), (1, 0))
+        self.assertEqual([e.course_id for e in response.context["recent_enrolled"]], [self.courses[0].pk])
@@ -0,0 +1,144 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+from .models import ChunkedUpload
+
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+READ_BLOCK_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class _PartFile(File):
+    # FileSystemStorage moves files that expose a temporary path instead of copying
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def part_path(upload):
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, f"{upload.pk}.part")
+
+
+def append_chunk(upload, offset, stream, length, checksum):
+    """
+    Write ``length`` bytes from ``stream`` at ``offset`` of the partial file.
+
+    The chunk is spooled to a temporary file and hashed on the way; only a
+    chunk whose SHA-256 matches ``checksum`` claims the offset and is copied
+    into the partial file. Returns the new acknowledged offset.
+    """
+    if upload.status != "uploading":
+        raise UploadError("Upload is already finalized.", status=409)
+    if offset != upload.received:
+        raise UploadError(f"Expected offset {upload.received}.", status=409)
+    if length <= 0 or length > UPLOAD_CHUNK_SIZE:
+        raise UploadError(f"Chunks must be 1 to {UPLOAD_CHUNK_SIZE} bytes.")
+    if offset + length > upload.size:
+        raise UploadError("Chunk runs past the declared file size.")
+
+    path = part_path(upload)
+    with tempfile.TemporaryFile(dir=settings.CHUNKED_UPLOAD_DIR) as chunk:
+        digest = hashlib.sha256()
+        written = 0
+        while written < length:
+            block = stream.read(min(READ_BLOCK_SIZE, length - written))
+            if not block:
+                break
+            chunk.write(block)
+            digest.update(block)
+            written += len(block)
+        if written != length or digest.hexdigest() != checksum.lower():
+            raise UploadError("Chunk checksum mismatch, resend from the acknowledged offset.")
+
+        # Compare-and-swap before touching the partial file, so of two clients
+        # racing on the same offset only the winner writes
+        acknowledged = ChunkedUpload.objects.filter(pk=upload.pk, received=offset).update(
+            received=offset + length, updated_at=timezone.now()
+        )
+        if not acknowledged:
+            raise UploadError("Offset moved by a concurrent request.", status=409)
+        try:
+            chunk.seek(0)
+            with open(path, "r+b" if os.path.exists(path) else "wb") as part:
+                part.seek(offset)
+                shutil.copyfileobj(chunk, part, READ_BLOCK_SIZE)
+        except OSError:
+            # Hand the offset back so the client can resend the chunk
+            ChunkedUpload.objects.filter(pk=upload.pk, received=offset + length).update(received=offset)
+            raise
+    upload.received = offset + length
+    return upload.received
+
+
+def finalize(upload):
+    """Verify the assembled file against its declared size and checksum."""
+    if upload.status != "uploading":
+        return
+    if upload.received != upload.size:
+        raise UploadError(f"Upload incomplete: {upload.received}/{upload.size} bytes.", status=409)
+    if upload.checksum:
+        digest = hashlib.sha256()
+        with open(part_path(upload), "rb") as part:
+            for block in iter(lambda: part.read(READ_BLOCK_SIZE), b""):
+                digest.update(block)
+        if digest.hexdigest() != upload.checksum.lower():
+            raise UploadError("File checksum mismatch.")
+    upload.status = "complete"
+    upload.save(update_fields=["status", "updated_at"])
+
+
+def attach(upload, field_file):
+    """
+    Move a finalized upload into ``field_file`` without re-reading its bytes.
+
+    Call it inside the transaction that saves the owning row: the upload is
+    claimed first, so it can only ever be attached once.
+    """
+    claimed = ChunkedUpload.objects.filter(pk=upload.pk, status="complete").update(
+        status="attached", updated_at=timezone.now()
+    )
+    if not claimed:
+        raise UploadError("Upload is not complete or already attached.", status=409)
+    with open(part_path(upload), "rb") as part:
+        field_file.save(upload.filename, _PartFile(part, name=upload.filename), save=False)
+    upload.status = "attached"
+
+
+def clean_abandoned(max_age=None):
+    """
+    Delete uploads that were never attached and have not been touched for
+    ``max_age`` seconds, together with partial files no upload refers to.
+    Returns the number of uploads deleted.
+    """
+    if max_age is None:
+        max_age = settings.CHUNKED_UPLOAD_EXPIRY
+    cutoff = timezone.now() - timedelta(seconds=max_age)
+    abandoned = ChunkedUpload.objects.filter(
+        status__in=["uploading", "complete"], updated_at__lt=cutoff
+    )
+    deleted, _ = abandoned.delete()
+
+    if not os.path.isdir(settings.CHUNKED_UPLOAD_DIR):
+        return deleted
+    live = {
+        f"{pk}.part" for pk in ChunkedUpload.objects.filter(
+            status__in=["uploading", "complete"]
+        ).values_list("pk", flat=True)
+    }
+    for entry in os.scandir(settings.CHUNKED_UPLOAD_DIR):
+        # Spooled chunks are anonymous, so only finished .part files show up here
+        if entry.is_file() and entry.name not in live and entry.stat().st_mtime < cutoff.timestamp():
+            os.remove(entry.path)
+    return deleted
@@ -22,17 +22,26 @@ urlpatterns = [
     path('viewcourse/<int:course_id>/', views.view_course, name="view_course"),
 
     path("search/", views.search_course, name="search_course"),
+    path("search/autocomplete/", views.search_autocomplete, name="search_autocomplete"),
     path("course/<int:course_id>/content/", views.course_content, name="course_content"),
 
     # Section CRUD [course --> section]
     path('sections/create/<int:course_id>/', views.section_create, name='create_section'),
     path('sections/delete/<int:section_id>/', views.section_delete, name='delete_section'),
+    # Whole-curriculum diffs: creates, renames, moves and deletes in one request
+    path('curriculum/batch/<int:course_id>/', views.curriculum_batch, name='curriculum_batch'),
     # path('sections/list/<int:course_id>/', views.section_list, name='list_section'),
     # path('sections/update/<int:section_id>/', views.update_section, name='update_section'),
 
     # Lectures (nested under section)
     path('lectures/create/<int:section_id>/', views.lecture_create, name='create_lecture'),
     path('lectures/delete/<int:lecture_id>/', views.lecture_delete, name='delete_lecture'),
+
+    # Chunked, resumable uploads (attached to lectures by upload id)
+    path('uploads/init/', views.upload_init, name='upload_init'),
+    path('uploads/<uuid:upload_id>/', views.upload_status, name='upload_status'),
+    path('uploads/<uuid:upload_id>/chunk/', views.upload_chunk, name='upload_chunk'),
+    path('uploads/<uuid:upload_id>/finalize/', views.upload_finalize, name='upload_finalize'),
   
     
 
@@ -1,9 +1,13 @@
 from .account import login_view, register_view, logout_view, student_dashboard, instructor_dashboard, change_password, profile
 
 
-from .course import  search_course ,view_certificate,enrolled_courses ,payment_failure, payment_success, process_payment, view_course, course_create, course_list, course_detail, course_edit, course_delete, course_content, published_courses
+from .course import  search_course ,search_autocomplete ,view_certificate,enrolled_courses ,payment_failure, payment_success, process_payment, view_course, course_create, course_list, course_detail, course_edit, course_delete, course_content, published_courses
 
-from .section import section_create, section_delete, lecture_create, lecture_delete
+from .section import section_create, curriculum_batch, section_delete, lecture_create, lecture_delete
 
 
-from .review import review_create, review_delete, review_update, review_list
\ No newline at end of file
+from .review import review_create, review_delete, review_update, review_list
+
+from .media import serve_media
+
+from .upload import upload_init, upload_chunk, upload_finalize, upload_status
\ No newline at end of file
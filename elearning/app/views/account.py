@@ -3,12 +3,17 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import login, logout, update_session_auth_hash
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from app.models import User,Course,Enrollment,Review,Certificate
+from app.models import User,Course,Enrollment,Certificate
+from app.dashboard import student_stats
 from django.contrib.auth import authenticate
-from django.db.models import Exists, OuterRef
+from decimal import Decimal
+from django.db.models import Count, DecimalField, Exists, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from app.budgets import query_budget
 
 
 @login_required
+@query_budget(3)
 def profile(request):
     user = request.user
     if request.method == "POST":
@@ -22,6 +27,7 @@ def profile(request):
         return redirect('profile')
     return render(request, 'home/profile.html', {'user': user})
 
+@query_budget(4)
 def register_view(request):
     if request.method == "POST":
         full_name = request.POST.get('fullname')
@@ -46,6 +52,7 @@ def register_view(request):
 
     return render(request, 'register.html')
 
+@query_budget(9)
 def login_view(request):
     if request.method == "POST":
         email = request.POST.get('email')
@@ -67,19 +74,21 @@ def login_view(request):
     return render(request, 'login.html')
 
 @login_required
+@query_budget(4)
 def logout_view(request):
     logout(request)
     return redirect('/')
 
 
 @login_required
+@query_budget(4, max_time_ms=50)
 def student_dashboard(request):
     user = request.user
 
     # Base queryset: this student's enrollments + the course
     enrollments_qs = (
         Enrollment.objects
-        .filter(user=user)
+        .filter(user=user, course__deleted_at__isnull=True)
         .select_related("course", "course__instructor")
     )
 
@@ -87,45 +96,66 @@ def student_dashboard(request):
     cert_exists_subquery = Certificate.objects.filter(enrollment_id=OuterRef("pk"))
     enrollments_qs = enrollments_qs.annotate(has_certificate=Exists(cert_exists_subquery))
 
-    # Stats
-    total_enrolled = enrollments_qs.count()
-    certificates_count = Certificate.objects.filter(enrollment__user=user).count()
-    completed_count = certificates_count  # treat "completed" == has certificate
-    reviews_count = Review.objects.filter(user=user).count()
+    # Stats: one aggregate query, cached until this user's data changes
+    stats = student_stats(user)
 
     # Recently enrolled (last 5 by purchase time)
     recent_enrolled = enrollments_qs.order_by("-purchased_at")[:5]
 
     context = {
-        "total_enrolled": total_enrolled,
-        "completed_count": completed_count,
-        "certificates_count": certificates_count,
-        "reviews_count": reviews_count,
+        **stats,
+        "completed_count": stats["certificates_count"],  # treat "completed" == has certificate
         "recent_enrolled": recent_enrolled,
     }
     return render(request, "home/student_dashboard.html", context)
 
 @login_required
+@query_budget(4, max_time_ms=50)
 def instructor_dashboard(request):
     user = request.user
-    # All courses by this instructor
-    all_courses = Course.objects.filter(instructor=user)
-    # Published courses
-    published_courses = all_courses.filter(is_published=True)
-    # Draft courses (not published yet)
-    draft_courses = all_courses.filter(is_published=False)
+    courses = Course.objects.filter(instructor=user)
+
+    # Per-course enrollment count as a correlated subquery, so the aggregate
+    # below runs as a single statement without join fan-out
+    enrolled = (
+        Enrollment.objects.filter(course=OuterRef("pk"))
+        .order_by()
+        .values("course")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    stats = courses.annotate(
+        enrolled=Coalesce(Subquery(enrolled), 0)
+    ).aggregate(
+        total_count=Count("pk"),
+        published_count=Count("pk", filter=Q(is_published=True)),
+        draft_count=Count("pk", filter=Q(is_published=False)),
+        total_students=Coalesce(Sum("enrolled"), 0),
+        total_revenue=Coalesce(
+            Sum(F("price") * F("enrolled"), output_field=DecimalField(max_digits=14, decimal_places=2)),
+            Value(Decimal("0")),
+        ),
+        rating_sum=Coalesce(Sum("rating_sum"), 0),
+        rating_count=Coalesce(Sum("rating_count"), 0),
+    )
+    rating_count = stats.pop("rating_count")
+    rating_sum = stats.pop("rating_sum")
+    stats["avg_rating"] = rating_sum / rating_count if rating_count else 0
+
+    # Narrow projection for the recent courses table
+    recent_courses = courses.only(
+        "id", "title", "category", "is_published", "price", "updated_at", "thumbnail_img"
+    ).order_by("-created_at")[:5]
 
     context = {
-        'all_courses': all_courses,
-        'published_courses': published_courses,
-        'draft_courses': draft_courses,
-        'published_count': published_courses.count(),
-        'draft_count': draft_courses.count(),
+        **stats,
+        'recent_courses': recent_courses,
     }
     return render(request, 'home/instructor_dashboard.html', context)
 
 
 @login_required
+@query_budget(12)
 def change_password(request):
     if request.method == 'POST':
         current_password = request.POST.get('current_password')
@@ -1,14 +1,27 @@
 from django.contrib import messages
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from ..models import Course, Section, Enrollment,Certificate
-import hmac, hashlib, base64, json
+from ..models import Course, Enrollment, Payment
+from datetime import datetime
 from django.utils import timezone
-from django.http import JsonResponse
-from django.db.models import Q
-
-
-def search_course(request):
+from django.urls import reverse
+from django.utils.http import urlencode
+from django.http import FileResponse, JsonResponse
+from asgiref.sync import sync_to_async
+from ..autocomplete import AUTOCOMPLETE_LIMIT, suggest
+from ..search import ranked_course_ids
+from ..catalog import CATALOG_PAGE_SIZE, apply_cursor, course_cards, split_page
+from ..facets import afacet_counts
+from ..curriculum import get_curriculum
+from ..entitlements import is_enrolled
+from ..payments import ESEWA_PRODUCT_CODE, decode_callback, record_callback, sign
+from ..budgets import query_budget
+from ..purge import soft_delete_course
+from ..pagecache import cache_anonymous_page, catalog_validators, course_validators
+
+
+@query_budget(4, max_time_ms=50)
+async def search_course(request):
     query = request.GET.get("q", "").strip()
     category = request.GET.get("category", "")
     level = request.GET.get("level", "")
@@ -17,33 +30,72 @@ def search_course(request):
     price_max = request.GET.get("price_max")
     published = request.GET.get("published", "")
 
-    courses = Course.objects.all()
-
     if query:
-        courses = courses.filter(
-            Q(title__icontains=query) |
-            Q(description__icontains=query) |
-            Q(instructor__username__icontains=query)
+        # Ranked lookup on the inverted index, only the current page is loaded
+        results = ranked_course_ids(
+            query,
+            category=category,
+            level=level,
+            instructor=instructor,
+            price_min=price_min,
+            price_max=price_max,
+            published=published,
         )
-
-    if category:
-        courses = courses.filter(category=category)
-    if level:
-        courses = courses.filter(level=level)
-    if instructor:
-        courses = courses.filter(instructor__username__icontains=instructor)
-    if price_min:
-        courses = courses.filter(price__gte=price_min)
-    if price_max:
-        courses = courses.filter(price__lte=price_max)
-    if published:
-        if published == "yes":
-            courses = courses.filter(is_published=True)
-        elif published == "no":
-            courses = courses.filter(is_published=False)
+        results = apply_cursor(results, request.GET.get("cursor"), "score", "course_id", int, int)
+    else:
+        results = course_cards(Course.objects.order_by("-created_at", "-id"))
+        if category:
+            results = results.filter(category=category)
+        if level:
+            results = results.filter(level=level)
+        if instructor:
+            results = results.filter(instructor__username__icontains=instructor)
+        if price_min:
+            results = results.filter(price__gte=price_min)
+        if price_max:
+            results = results.filter(price__lte=price_max)
+        if published:
+            if published == "yes":
+                results = results.filter(is_published=True)
+            elif published == "no":
+                results = results.filter(is_published=False)
+        results = apply_cursor(results, request.GET.get("cursor"), "created_at", "id", datetime, int)
+
+    # Keyset pagination: one look-ahead row instead of a COUNT and an OFFSET
+    rows = [row async for row in results[:CATALOG_PAGE_SIZE + 1]]
+    if query:
+        rows, next_cursor = split_page(rows, CATALOG_PAGE_SIZE, lambda row: (row["score"], row["course_id"]))
+        course_ids = [row["course_id"] for row in rows]
+        found = await course_cards(Course.objects.all()).ain_bulk(course_ids)
+        courses = [found[pk] for pk in course_ids if pk in found]
+    else:
+        courses, next_cursor = split_page(rows, CATALOG_PAGE_SIZE, lambda course: (course.created_at, course.pk))
+
+    params = request.GET.copy()
+    params.pop("cursor", None)
+
+    facets = await afacet_counts(
+        query,
+        category=category,
+        level=level,
+        instructor=instructor,
+        price_min=price_min,
+        price_max=price_max,
+        published=published,
+    )
+    price_buckets = []
+    for _, label, low, high, count in facets["price"]:
+        bucket = params.copy()
+        bucket["price_min"], bucket["price_max"] = low, "" if high is None else high
+        price_buckets.append((label, count, bucket.urlencode()))
 
     context = {
         "courses": courses,
+        "facets": facets,
+        "price_buckets": price_buckets,
+        "next_cursor": next_cursor,
+        "is_first_page": "cursor" not in request.GET,
+        "querystring": params.urlencode(),
         "query": query,
         "category": category,
         "level": level,
@@ -53,39 +105,70 @@ def search_course(request):
         "published": published,
     }
 
-    return render(request, "course/search_course.html", context)
+    # Templates touch request.user and other lazy state, so render off the event loop
+    return await sync_to_async(render)(request, "course/search_course.html", context)
+
+
+# Only the first lookup in a process reads the database, to build the index
+@query_budget(1)
+def search_autocomplete(request):
+    try:
+        limit = int(request.GET.get("limit", AUTOCOMPLETE_LIMIT))
+    except ValueError:
+        limit = AUTOCOMPLETE_LIMIT
+    limit = max(1, min(limit, AUTOCOMPLETE_LIMIT))
+
+    search_url = reverse("search_course")
+    results = []
+    for match in suggest(request.GET.get("q", ""), limit):
+        kind, pk = match["key"]
+        if kind == "course":
+            url = reverse("view_course", args=[pk])
+        else:
+            url = f"{search_url}?{urlencode({'instructor': match['username']})}"
+        results.append({"type": kind, "id": pk, "label": match["label"], "url": url, "thumbnail": match.get("thumbnail")})
+    return JsonResponse({"results": results})
 
 
 @login_required
+@query_budget(3)
 def enrolled_courses(request):
-    enrollments = Enrollment.objects.filter(user=request.user).select_related("course", "course__instructor")
+    enrollments = Enrollment.objects.filter(user=request.user, course__deleted_at__isnull=True).select_related(
+        "course", "course__instructor"
+    )
     return render(request, "course/enrollcourse.html", {"enrollments": enrollments})
 
+@cache_anonymous_page(catalog_validators, query_params=("cursor",))
+@query_budget(3, max_time_ms=50)
 def published_courses(request):
-    published_courses = Course.objects.filter(is_published=True).order_by("-created_at")
-    context = {"courses": published_courses}
+    courses = course_cards(Course.objects.filter(is_published=True).order_by("-created_at", "-id"))
+    courses = apply_cursor(courses, request.GET.get("cursor"), "created_at", "id", datetime, int)
+    courses, next_cursor = split_page(
+        list(courses[:CATALOG_PAGE_SIZE + 1]), CATALOG_PAGE_SIZE, lambda course: (course.created_at, course.pk)
+    )
+    context = {
+        "courses": courses,
+        "next_cursor": next_cursor,
+        "is_first_page": "cursor" not in request.GET,
+    }
     return render(request, "course/published_courses.html", context)
 
 
+@cache_anonymous_page(course_validators)
+@query_budget(6, max_time_ms=50)
 def view_course(request, course_id):
-    course = get_object_or_404(Course, id=course_id, is_published=True)
-    sections = Section.objects.filter(course=course).prefetch_related("lectures")
-
-    # calculate total lectures
-    total_lectures = sum(section.lectures.count() for section in sections)
+    course = get_object_or_404(Course.objects.select_related("instructor"), id=course_id, is_published=True)
+    curriculum = get_curriculum(course.id)
 
     # Check if user purchased/enrolled
-    purchased = False
-    if request.user.is_authenticated:
-        purchased = Enrollment.objects.filter(user=request.user, course=course).exists()
+    purchased = is_enrolled(request.user, course.id)
 
     return render(
         request,
         "course/viewcourse.html",
         {
             "course": course,
-            "sections": sections,
-            "total_lectures": total_lectures,
+            "curriculum": curriculum,
             "purchased": purchased,
         },
     )
@@ -93,23 +176,28 @@ def view_course(request, course_id):
 
 
 @login_required
+@query_budget(7)
 def process_payment(request, course_id):
     course = get_object_or_404(Course, id=course_id)
     user = request.user
     now = timezone.now()
 
-    SECRET_KEY = b"8gBm/:&EnhH.1/q"  # UAT SecretKey
-
     # Payment parameters
     total_amount = str(course.price)
     transaction_uuid = f"{course.id}-{user.id}-{int(now.timestamp())}"
-    product_code = "EPAYTEST"
-    signed_field_names = "total_amount,transaction_uuid,product_code"
-
-    # Signature creation (HMAC-SHA256 + base64)
-    message = f"total_amount={total_amount},transaction_uuid={transaction_uuid},product_code={product_code}"
-    signature = hmac.new(SECRET_KEY, message.encode("utf-8"), hashlib.sha256)
-    esewa_signature = base64.b64encode(signature.digest()).decode("utf-8")
+    esewa_signature = sign(
+        ("total_amount", "transaction_uuid", "product_code"),
+        {
+            "total_amount": total_amount,
+            "transaction_uuid": transaction_uuid,
+            "product_code": ESEWA_PRODUCT_CODE,
+        },
+    )
+    # A reload within the same second reuses the pending payment
+    Payment.objects.get_or_create(
+        transaction_uuid=transaction_uuid,
+        defaults={"user": user, "course": course, "amount": course.price},
+    )
 
     # Correct absolute URLs without double slashes
     base_url = request.build_absolute_uri('/')[:-1]  # removes trailing slash
@@ -123,6 +211,7 @@ def process_payment(request, course_id):
         "success_url": success_url,
         "failure_url": failure_url,
         "esewa_signature": esewa_signature,
+        "product_code": ESEWA_PRODUCT_CODE,
     }
 
     return render(request, "payment/payment.html", context)
@@ -130,23 +219,13 @@ def process_payment(request, course_id):
 
 
 @login_required
+@query_budget(12)
 def payment_success(request, course_id):
     course = get_object_or_404(Course, id=course_id)
-    data = request.GET.get('data', None)
-    esewa_data = {}
-    if data:
-        try:
-            decoded = base64.b64decode(data).decode('utf-8')
-            esewa_data = json.loads(decoded)
-        except Exception as e:
-            esewa_data = {"error": str(e)}
-
-    # Enroll the user if payment successful
-    enrollment, created = Enrollment.objects.get_or_create(user=request.user, course=course)
-
-    # Issue certificate if course allows
-    if course.offer_certificate:
-        Certificate.objects.get_or_create(enrollment=enrollment)
+    esewa_data = decode_callback(request.GET.get('data', ''))
+    if not esewa_data or not record_callback(request.user, course, esewa_data):
+        messages.error(request, "We could not verify this payment.")
+        return redirect("payment_failure", course_id=course.id)
 
     return render(request, 'payment/success.html', {
         'course': course,
@@ -155,11 +234,13 @@ def payment_success(request, course_id):
 
 
 @login_required
+@query_budget(3)
 def payment_failure(request, course_id):
     course = get_object_or_404(Course, id=course_id)
     return render(request, 'payment/failure.html', {'course': course})
 
 @login_required
+@query_budget(5)
 def view_certificate(request, course_id):
     enrollment = get_object_or_404(Enrollment, user=request.user, course_id=course_id)
     if not enrollment.course.offer_certificate:
@@ -171,6 +252,13 @@ def view_certificate(request, course_id):
         messages.error(request, "No certificate issued yet.")
         return redirect("enrolled_courses")
 
+    # Serve the PDF once the background worker has rendered it
+    if certificate.pdf_file and request.GET.get("format") != "html":
+        return FileResponse(
+            certificate.pdf_file.open("rb"),
+            filename=f"certificate-{certificate.certificate_id}.pdf",
+        )
+
     return render(request, "course/certificate.html", {
         "certificate": certificate,
         "course": enrollment.course,
@@ -179,6 +267,7 @@ def view_certificate(request, course_id):
 
 
 @login_required
+@query_budget(7)
 def course_create(request):
     if not hasattr(request.user, "role") or request.user.role != "instructor":
         messages.error(request, "You do not have permission to create a course.")
@@ -227,14 +316,16 @@ def course_create(request):
 
 
 @login_required
+@query_budget(3)
 def course_list(request):
     courses = Course.objects.filter(instructor=request.user)
     return render(request, "course/course_list.html", {"courses": courses})
 
 
 @login_required
+@query_budget(3)
 def course_detail(request, course_id):
-    course = get_object_or_404(Course, pk=course_id)
+    course = get_object_or_404(Course.objects.select_related("instructor"), pk=course_id)
     sections = course.sections.all()
     return render(
         request, "course/course_detail.html", {"course": course, "sections": sections}
@@ -242,13 +333,15 @@ def course_detail(request, course_id):
 
 
 @login_required
+@query_budget(8)
 def course_edit(request, course_id):
-    course = get_object_or_404(Course, pk=course_id)
+    # The search index reads the instructor name on save
+    course = get_object_or_404(Course.objects.select_related("instructor"), pk=course_id)
 
     if (
         not hasattr(request.user, "role")
         or request.user.role != "instructor"
-        or course.instructor != request.user
+        or course.instructor_id != request.user.id
     ):
         messages.error(request, "You do not have permission to edit this course.")
         return redirect("home")
@@ -298,19 +391,21 @@ def course_edit(request, course_id):
 
 
 @login_required
+@query_budget(11)
 def course_delete(request, course_id):
-    course = get_object_or_404(Course, pk=course_id)
+    course = get_object_or_404(Course.objects.select_related("instructor"), pk=course_id)
 
     if (
         not hasattr(request.user, "role")
         or request.user.role != "instructor"
-        or course.instructor != request.user
+        or course.instructor_id != request.user.id
     ):
         messages.error(request, "You do not have permission to delete this course.")
         return redirect("/")
 
     if request.method == "POST":
-        course.delete()
+        # Hidden now; rows and media are purged in the background
+        soft_delete_course(course)
         messages.success(
             request, f"Course '{course.title}' has been deleted successfully."
         )
@@ -320,9 +415,10 @@ def course_delete(request, course_id):
 
 
 @login_required
+@query_budget(5)
 def course_content(request, course_id):
     course = get_object_or_404(Course, id=course_id)
-    sections = course.sections.prefetch_related("lectures").all()
+    curriculum = get_curriculum(course.id)
     return render(
-        request, "course/course_content.html", {"course": course, "sections": sections}
+        request, "course/course_content.html", {"course": course, "curriculum": curriculum}
     )
@@ -0,0 +1,150 @@
+import mimetypes
+import os
+import re
+import stat
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class _FileRange:
+    """
+    Read-bounded view over an open file, starting at its current offset.
+
+    Exposes ``fileno()`` so sendfile-capable servers (gunicorn) can push the
+    bytes with ``os.sendfile``, bounded by the response's Content-Length.
+    """
+
+    def __init__(self, fileobj, length):
+        self.fileobj = fileobj
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b""
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.fileobj.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.fileobj.fileno()
+
+    def close(self):
+        self.fileobj.close()
+
+
+class _Unsatisfiable(Exception):
+    pass
+
+
+def _parse_range(header, size):
+    """
+    Return ``(start, end)`` inclusive for a single byte range, or None when the
+    header is not a single byte range (it is then ignored and the full file is
+    sent). Raises ``_Unsatisfiable`` when no byte of the range exists.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise _Unsatisfiable
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise _Unsatisfiable
+    return start, end
+
+
+def _if_range_passes(request, etag, mtime):
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    since = parse_http_date_safe(if_range)
+    return since is not None and int(mtime) <= since
+
+
+def _offload(path, content_type):
+    """Hand the transfer to the front proxy when MEDIA_SENDFILE_HEADER is set."""
+    header = getattr(settings, "MEDIA_SENDFILE_HEADER", None)
+    if not header:
+        return None
+    response = HttpResponse(content_type=content_type)
+    if header == "X-Accel-Redirect":
+        relative = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, "/")
+        response[header] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + relative
+    else:
+        response[header] = path
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve a file from MEDIA_ROOT with Range, ETag and Last-Modified support.
+    """
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+        stat_result = os.stat(fullpath)
+    except (OSError, ValueError):
+        raise Http404("File does not exist")
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise Http404("File does not exist")
+
+    size = stat_result.st_size
+    etag = f'"{stat_result.st_mtime_ns:x}-{size:x}"'
+    last_modified = int(stat_result.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return response
+
+    content_type = mimetypes.guess_type(fullpath)[0] or "application/octet-stream"
+    response = _offload(fullpath, content_type)
+    if response is None:
+        byte_range = None
+        range_header = request.META.get("HTTP_RANGE")
+        if range_header and _if_range_passes(request, etag, stat_result.st_mtime):
+            try:
+                byte_range = _parse_range(range_header, size)
+            except _Unsatisfiable:
+                response = HttpResponse(status=416)
+                response["Content-Range"] = f"bytes */{size}"
+                return response
+
+        fileobj = open(fullpath, "rb")
+        if byte_range:
+            start, end = byte_range
+            fileobj.seek(start)
+            length = end - start + 1
+            response = FileResponse(
+                _FileRange(fileobj, length), status=206, content_type=content_type
+            )
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        else:
+            length = size
+            response = FileResponse(fileobj, content_type=content_type)
+        response["Content-Length"] = length
+
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    return response
@@ -1,53 +1,166 @@
-from django.http import JsonResponse
-from django.shortcuts import get_object_or_404
+import json
+from datetime import datetime
+
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from django.views.decorators.http import require_POST
-from app.models import Course, Review, Enrollment
+from asgiref.sync import sync_to_async
+from app.models import Course, Review
+from app.entitlements import ais_enrolled
+from app.ratings import MIN_RATING, MAX_RATING, apply_rating_change
+from app.budgets import query_budget
+from app.catalog import InvalidCursor, after, decode_cursor, split_page
+
+REVIEW_PAGE_SIZE = 20
+REVIEW_MAX_PAGE_SIZE = 100
+REVIEW_STREAM_CHUNK_SIZE = 500
+
+
+def _parse_rating(value):
+    try:
+        rating = int(value)
+    except (TypeError, ValueError):
+        return None
+    if MIN_RATING <= rating <= MAX_RATING:
+        return rating
+    return None
+
+
+def _stream_reviews(reviews):
+    for review in reviews.iterator(chunk_size=REVIEW_STREAM_CHUNK_SIZE):
+        yield json.dumps(review, cls=DjangoJSONEncoder) + "\n"
 
-def review_list(request, course_id):
-    course = get_object_or_404(Course, id=course_id)
-    reviews = course.reviews.select_related("user").values(
+
+async def _astream_reviews(reviews):
+    async for review in reviews.aiterator(chunk_size=REVIEW_STREAM_CHUNK_SIZE):
+        yield json.dumps(review, cls=DjangoJSONEncoder) + "\n"
+
+
+@query_budget(2, max_time_ms=50)
+async def review_list(request, course_id):
+    course = await aget_object_or_404(Course, id=course_id)
+    reviews = course.reviews.order_by("-created_at", "-id").values(
         "id", "user__full_name", "rating", "comment", "created_at"
     )
-    summary = Review.course_rating_summary(course.id)
+
+    # NDJSON mode streams every review, one per line, in constant memory.
+    # WSGI buffers an async iterator whole, so it gets the sync one.
+    if request.GET.get("format") == "ndjson":
+        stream = _astream_reviews if isinstance(request, ASGIRequest) else _stream_reviews
+        return StreamingHttpResponse(
+            stream(reviews), content_type="application/x-ndjson"
+        )
+
+    try:
+        page_size = int(request.GET.get("page_size", REVIEW_PAGE_SIZE))
+    except ValueError:
+        page_size = REVIEW_PAGE_SIZE
+    page_size = max(1, min(page_size, REVIEW_MAX_PAGE_SIZE))
+
+    cursor = request.GET.get("cursor")
+    if cursor:
+        try:
+            reviews = reviews.filter(after("created_at", "id", decode_cursor(cursor, datetime, int)))
+        except InvalidCursor:
+            return JsonResponse({"error": "Invalid cursor."}, status=400)
+
+    # Fetch one extra row to learn whether another page exists
+    page = [review async for review in reviews[:page_size + 1]]
+    page, next_cursor = split_page(page, page_size, lambda review: (review["created_at"], review["id"]))
+
     return JsonResponse({
-        "reviews": list(reviews),
-        "avg_rating": round(summary["avg_rating"] or 0, 1),
-        "total_reviews": summary["total_reviews"],
+        "reviews": page,
+        "next_cursor": next_cursor,
+        "avg_rating": round(course.rating_avg, 1),
+        "total_reviews": course.rating_count,
     })
 
 
+# The async ORM cannot open transactions, so each review write and its rating
+# delta run together in a worker thread.
+
+@sync_to_async
+def _save_review(course, user, rating, comment):
+    with transaction.atomic():
+        old_rating = (
+            Review.objects.select_for_update()
+            .filter(course=course, user=user)
+            .values_list("rating", flat=True)
+            .first()
+        )
+        review, created = Review.objects.update_or_create(
+            course=course, user=user,
+            defaults={"rating": rating, "comment": comment},
+        )
+        apply_rating_change(course.id, old=old_rating, new=rating)
+    return review
+
+
+@sync_to_async
+def _update_review(review, rating, comment):
+    with transaction.atomic():
+        old_rating = Review.objects.select_for_update().values_list(
+            "rating", flat=True
+        ).get(pk=review.pk)
+        review.rating = rating
+        review.comment = comment
+        review.save()
+        apply_rating_change(review.course_id, old=old_rating, new=rating)
+
+
+@sync_to_async
+def _delete_review(review):
+    with transaction.atomic():
+        rating = Review.objects.select_for_update().values_list(
+            "rating", flat=True
+        ).filter(pk=review.pk).first()
+        if rating is None:
+            return
+        review.delete()
+        apply_rating_change(review.course_id, old=rating)
+
+
 @login_required
 @require_POST
-def review_create(request, course_id):
-    course = get_object_or_404(Course, id=course_id)
-    if not Enrollment.objects.filter(user=request.user, course=course).exists():
+@query_budget(12)
+async def review_create(request, course_id):
+    user = await request.auser()
+    course = await aget_object_or_404(Course, id=course_id)
+    if not await ais_enrolled(user, course.id):
         return JsonResponse({"error": "You must be enrolled to review."}, status=403)
 
-    rating = int(request.POST.get("rating", 0))
+    rating = _parse_rating(request.POST.get("rating", 0))
+    if rating is None:
+        return JsonResponse({"error": "Rating must be between 1 and 5."}, status=400)
     comment = request.POST.get("comment", "")
 
-    review, created = Review.objects.update_or_create(
-        course=course, user=request.user,
-        defaults={"rating": rating, "comment": comment},
-    )
+    review = await _save_review(course, user, rating, comment)
 
     return JsonResponse({"success": True, "review_id": review.id})
 
 
 @login_required
 @require_POST
-def review_update(request, review_id):
-    review = get_object_or_404(Review, id=review_id, user=request.user)
-    review.rating = int(request.POST.get("rating", review.rating))
-    review.comment = request.POST.get("comment", review.comment)
-    review.save()
+@query_budget(8)
+async def review_update(request, review_id):
+    user = await request.auser()
+    review = await aget_object_or_404(Review, id=review_id, user=user)
+    rating = _parse_rating(request.POST.get("rating", review.rating))
+    if rating is None:
+        return JsonResponse({"error": "Rating must be between 1 and 5."}, status=400)
+    await _update_review(review, rating, request.POST.get("comment", review.comment))
     return JsonResponse({"success": True})
 
 
 @login_required
 @require_POST
-def review_delete(request, review_id):
-    review = get_object_or_404(Review, id=review_id, user=request.user)
-    review.delete()
+@query_budget(8)
+async def review_delete(request, review_id):
+    user = await request.auser()
+    review = await aget_object_or_404(Review, id=review_id, user=user)
+    await _delete_review(review)
     return JsonResponse({"success": True})
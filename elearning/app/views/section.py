@@ -1,13 +1,22 @@
-from django.shortcuts import render, get_object_or_404, redirect
+import json
+
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, get_object_or_404, aget_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
-from ..models import Course, Section, Lecture
+from django.db import transaction
+from django.views.decorators.http import require_POST
+from ..models import Course, Section, Lecture, ChunkedUpload
+from ..uploads import UploadError, attach
+from ..curriculum import CurriculumError, abump_curriculum_version, apply_curriculum_diff, bump_curriculum_version
+from ..budgets import query_budget
 
 
 @login_required
-def section_create(request, course_id):
-    course = get_object_or_404(Course, id=course_id)
+@query_budget(6)
+async def section_create(request, course_id):
+    course = await aget_object_or_404(Course, id=course_id)
 
     if request.method == "POST":
         title = request.POST.get("title")
@@ -16,7 +25,8 @@ def section_create(request, course_id):
         if not title or not order:
             return JsonResponse({"success": False, "error": "Title and order are required."})
 
-        section = Section.objects.create(course=course, title=title, order=order)
+        section = await Section.objects.acreate(course=course, title=title, order=order)
+        await abump_curriculum_version(course.id)
         return JsonResponse({
             "success": True,
             "section": {
@@ -26,15 +36,37 @@ def section_create(request, course_id):
             }
         })
 
-    sections = course.sections.prefetch_related("lectures")
-    return render(request, "section/section_create.html", {"course": course, "sections": sections})
+    sections = [section async for section in course.sections.prefetch_related("lectures")]
+    # Templates touch request.user and other lazy state, so render off the event loop
+    return await sync_to_async(render)(
+        request, "section/section_create.html", {"course": course, "sections": sections}
+    )
+
+
+@sync_to_async
+def _save_lecture(lecture, uploads):
+    # Moving uploaded files into storage is blocking file I/O
+    try:
+        with transaction.atomic():
+            lecture.save()
+            for field, upload in uploads.items():
+                attach(upload, getattr(lecture, field))
+            if uploads:
+                lecture.save(update_fields=list(uploads))
+    except Exception:
+        # The rows rolled back, so do not leave the moved files behind
+        for field in uploads:
+            getattr(lecture, field).delete(save=False)
+        raise
 
 
 @login_required
-def lecture_create(request, section_id):
-    section = get_object_or_404(Section, id=section_id)
+@query_budget(9)
+async def lecture_create(request, section_id):
+    section = await aget_object_or_404(Section, id=section_id)
 
     if request.method == "POST":
+        user = await request.auser()
         title = request.POST.get("title")
         order = request.POST.get("order")
         description = request.POST.get("description", "")
@@ -45,7 +77,19 @@ def lecture_create(request, section_id):
         if not title or not order:
             return JsonResponse({"success": False, "error": "Title and order are required."})
 
-        lecture = Lecture.objects.create(
+        # Files sent through the chunked upload endpoints are referenced by id
+        uploads = {}
+        for field in ("video", "resource_file"):
+            upload_id = request.POST.get(f"{field}_upload_id")
+            if upload_id:
+                upload = await ChunkedUpload.objects.filter(
+                    pk=upload_id, user=user, status="complete"
+                ).afirst()
+                if upload is None:
+                    return JsonResponse({"success": False, "error": f"Unknown or unfinished {field} upload."})
+                uploads[field] = upload
+
+        lecture = Lecture(
             section=section,
             title=title,
             order=order,
@@ -54,6 +98,11 @@ def lecture_create(request, section_id):
             resource_file=resource_file,
             is_previewable=is_previewable
         )
+        try:
+            await _save_lecture(lecture, uploads)
+        except UploadError as e:
+            return JsonResponse({"success": False, "error": str(e)}, status=e.status)
+        await abump_curriculum_version(section.course_id)
 
         return JsonResponse({
             "success": True,
@@ -71,16 +120,43 @@ def lecture_create(request, section_id):
 
 
 @login_required
+@require_POST
+@query_budget(12)
+def curriculum_batch(request, course_id):
+    """
+    Apply a whole curriculum diff (see ``apply_curriculum_diff``) posted as
+    JSON, in one transaction with bulk writes.
+    """
+    course = get_object_or_404(Course, id=course_id)
+    if course.instructor_id != request.user.id:
+        return JsonResponse({"success": False, "error": "Only the course instructor can edit its curriculum."}, status=403)
+    try:
+        diff = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"success": False, "error": "Invalid JSON."}, status=400)
+
+    try:
+        created = apply_curriculum_diff(course, diff)
+    except CurriculumError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=e.status)
+    return JsonResponse({"success": True, "created": created})
+
+
+@login_required
+@query_budget(5)
 def section_delete(request, section_id):
     section = get_object_or_404(Section, id=section_id)
-    course_id = section.course.id
+    course_id = section.course_id
     section.delete()
+    bump_curriculum_version(course_id)
     return JsonResponse({"success": True, "course_id": course_id})
 
 
 @login_required
+@query_budget(4)
 def lecture_delete(request, lecture_id):
-    lecture = get_object_or_404(Lecture, id=lecture_id)
-    section_id = lecture.section.id
+    lecture = get_object_or_404(Lecture.objects.select_related("section"), id=lecture_id)
+    section_id = lecture.section_id
     lecture.delete()
+    bump_curriculum_version(lecture.section.course_id)
     return JsonResponse({"success": True, "section_id": section_id})
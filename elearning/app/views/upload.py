@@ -0,0 +1,88 @@
+import os
+
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET, require_POST
+
+from ..models import ChunkedUpload
+from ..uploads import UPLOAD_CHUNK_SIZE, UploadError, append_chunk, finalize
+from ..budgets import query_budget
+
+
+def _upload_status(upload):
+    return {
+        "upload_id": str(upload.pk),
+        "filename": upload.filename,
+        "size": upload.size,
+        "received": upload.received,
+        "status": upload.status,
+        "chunk_size": UPLOAD_CHUNK_SIZE,
+    }
+
+
+@login_required
+@require_POST
+@query_budget(3)
+def upload_init(request):
+    filename = os.path.basename(request.POST.get("filename", "").strip())
+    try:
+        size = int(request.POST.get("size", 0))
+    except ValueError:
+        size = 0
+
+    if not filename or size <= 0:
+        return JsonResponse({"success": False, "error": "Filename and size are required."}, status=400)
+
+    upload = ChunkedUpload.objects.create(
+        user=request.user,
+        filename=filename,
+        size=size,
+        checksum=request.POST.get("checksum", "").strip(),
+    )
+    return JsonResponse({"success": True, **_upload_status(upload)})
+
+
+@login_required
+@require_POST
+@query_budget(4)
+def upload_chunk(request, upload_id):
+    """
+    Append the raw request body at ``?offset=``; the body's SHA-256 goes in
+    the ``X-Chunk-Checksum`` header.
+    """
+    upload = get_object_or_404(ChunkedUpload, pk=upload_id, user=request.user)
+    try:
+        offset = int(request.GET.get("offset", -1))
+        length = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        return JsonResponse({"success": False, "error": "Invalid offset."}, status=400)
+    checksum = request.headers.get("X-Chunk-Checksum", "")
+    if not checksum:
+        return JsonResponse({"success": False, "error": "X-Chunk-Checksum header is required."}, status=400)
+
+    try:
+        append_chunk(upload, offset, request, length, checksum)
+    except UploadError as e:
+        return JsonResponse({"success": False, "error": str(e), **_upload_status(upload)}, status=e.status)
+    return JsonResponse({"success": True, **_upload_status(upload)})
+
+
+@login_required
+@require_POST
+@query_budget(4)
+def upload_finalize(request, upload_id):
+    upload = get_object_or_404(ChunkedUpload, pk=upload_id, user=request.user)
+    try:
+        finalize(upload)
+    except UploadError as e:
+        return JsonResponse({"success": False, "error": str(e), **_upload_status(upload)}, status=e.status)
+    return JsonResponse({"success": True, **_upload_status(upload)})
+
+
+@login_required
+@require_GET
+@query_budget(3)
+def upload_status(request, upload_id):
+    upload = get_object_or_404(ChunkedUpload, pk=upload_id, user=request.user)
+    return JsonResponse({"success": True, **_upload_status(upload)})
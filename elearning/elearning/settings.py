@@ -61,8 +61,15 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compile each template once per process, in development too;
+            # the autoreloader clears it when a template file changes
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
@@ -82,6 +89,46 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock at BEGIN, so a transaction that reads then
+            # writes waits on busy_timeout instead of failing as "locked"
+            'transaction_mode': 'IMMEDIATE',
+        },
+    }
+}
+
+# Applied to every SQLite connection when it opens (app.signals)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',          # readers no longer block on the writer
+    'busy_timeout': 5000,           # ms to wait for the write lock
+    'synchronous': 'NORMAL',        # fsync at checkpoints only; safe with WAL
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,       # negative = KiB, i.e. 64 MiB page cache
+    'temp_store': 'MEMORY',
+}
+
+# SQLITE_READ_REPLICA=1 sends catalog reads (courses, curricula, reviews,
+# search) to a second, read-only connection to the same WAL database
+if os.environ.get('SQLITE_READ_REPLICA') == '1':
+    DATABASES['readonly'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f"file:{DATABASES['default']['NAME']}?mode=ro",
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['app.routers.ReadOnlyCatalogRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Every web worker and the run_jobs process must see the same cache, or a
+# version bump in one of them never invalidates the others' entries
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', os.path.join(BASE_DIR, 'cache')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
     }
 }
 
@@ -138,5 +185,26 @@ NPM_BIN_PATH='/usr/local/bin/npm'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Let the front proxy push media bytes instead of the app worker:
+# 'X-Accel-Redirect' for nginx (internal location at MEDIA_ACCEL_REDIRECT_PREFIX)
+# or 'X-Sendfile' for Apache/lighttpd. None streams the file from Django.
+MEDIA_SENDFILE_HEADER = None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+# Chunked uploads are assembled here, outside MEDIA_ROOT so half-written
+# files are never served, and moved into media storage once attached
+CHUNKED_UPLOAD_DIR = os.environ.get('CHUNKED_UPLOAD_DIR', os.path.join(BASE_DIR, 'uploads'))
+# Unattached uploads untouched for this long are deleted by `clean_uploads`
+CHUNKED_UPLOAD_EXPIRY = 24 * 60 * 60
+
+
+AUTH_USER_MODEL = 'app.User'
+
+# Also fail @query_budget routes on their max_time_ms (SQL wall-clock time).
+# Off by default: timings vary with the machine, so enable it on a quiet one
+QUERY_BUDGET_CHECK_TIME = os.environ.get('QUERY_BUDGET_CHECK_TIME') == '1'
 
-AUTH_USER_MODEL = 'app.User'
\ No newline at end of file
+# eSewa ePay v2 credentials; the defaults are eSewa's public UAT sandbox
+# values, so set real ones in production
+ESEWA_SECRET_KEY = os.environ.get('ESEWA_SECRET_KEY', '8gBm/:&EnhH.1/q')
+ESEWA_PRODUCT_CODE = os.environ.get('ESEWA_PRODUCT_CODE', 'EPAYTEST')
\ No newline at end of file
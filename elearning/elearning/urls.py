@@ -18,7 +18,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from . import views
-from django.conf.urls.static import static
+from app.views import serve_media
 from django.views.generic.base import RedirectView
 
 urlpatterns = [
@@ -28,6 +28,6 @@ urlpatterns = [
     path('', include('app.urls')),  
     path("__reload__/", include("django_browser_reload.urls")),
     path('favicon.ico', RedirectView.as_view(url=settings.STATIC_URL + 'images/favicon.ico', permanent=True)),
+    path(settings.MEDIA_URL.lstrip('/') + '<path:path>', serve_media, name='serve_media'),
 
-
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+]
\ No newline at end of file
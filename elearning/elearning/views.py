@@ -1,6 +1,8 @@
 from django.shortcuts import render
 from app.models import Course
+from app.pagecache import cache_anonymous_page, catalog_validators
 
+@cache_anonymous_page(catalog_validators)
 def index(request):
     # Get latest 3 published courses
     recent_courses = Course.objects.filter(is_published=True).order_by('-created_at')[:3]